@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 from pathlib import Path
 import json
 import os
@@ -8,7 +8,8 @@ import time
 from dotenv import load_dotenv
 
 from utils.data_loader import load_statistics, get_verification_notes
-from utils.neuraxon_processor import load_neuraxon_data, extract_frames, get_frame_statistics
+from utils.neuraxon_processor import select_frame_fields, ColumnarFrame, FRAME_FIELDS, NODE_FIELDS
+from utils.neuraxon_store import get_frame_source
 from utils.anna_data_processor import process_anna_data
 from utils.ml_data_processor import process_ml_data
 from utils.grid_data_processor import process_grid_data
@@ -18,6 +19,7 @@ from utils.layer_processor import process_layer_data
 from utils.helix_processor import process_helix_data
 from utils.dark_matter_processor import process_dark_matter_data
 from utils.evolutionary_processor import process_evolutionary_data
+from utils.response_cache import cached_json_response
 
 load_dotenv()
 
@@ -56,7 +58,8 @@ def add_security_headers(response):
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
-    else:
+    elif 'ETag' not in response.headers:
+        # Cached API bodies carry their own Cache-Control and revalidate via ETag
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -75,6 +78,20 @@ DATA_DIR = BASE_DIR / 'data'
 if not DATA_DIR.exists():
     DATA_DIR = BASE_DIR.parent.parent / 'data'
 
+# Cache-Control for cached API bodies, keyed by response cache name.
+# 'no-cache' lets clients keep the body but revalidate it (304 via ETag) on every poll.
+API_CACHE_CONTROL_DEFAULT = os.getenv('API_CACHE_CONTROL', 'no-cache')
+API_CACHE_CONTROL = {
+    'stats': 'public, max-age=300',
+    'statistics-data': 'public, max-age=300',
+    'discrepancy-data': 'public, max-age=300',
+    'layers-data': 'public, max-age=300',
+}
+
+
+def api_json_response(name, payload, version=None):
+    return cached_json_response(name, payload, API_CACHE_CONTROL.get(name, API_CACHE_CONTROL_DEFAULT), version)
+
 
 @app.route('/')
 def index():
@@ -178,12 +195,11 @@ def evolutionary():
 
 @app.route('/api/stats')
 def api_stats():
-    stats = load_statistics()
-    verification_notes = get_verification_notes()
-    return jsonify({
-        'statistics': stats,
-        'verification_notes': verification_notes
-    })
+    # Constants that only change with a deploy, so the body is encoded once per process
+    return api_json_response('stats', lambda: {
+        'statistics': load_statistics(),
+        'verification_notes': get_verification_notes()
+    }, version='static')
 
 
 @app.route('/api/anna-data')
@@ -193,7 +209,7 @@ def api_anna_data():
         if not processed_data.get('top_words') and not processed_data.get('error'):
             import sys
             print(f"WARNING: /api/anna-data returned empty data", file=sys.stderr)
-        return jsonify(processed_data)
+        return api_json_response('anna-data', processed_data)
     except Exception as e:
         import sys, traceback
         print(f"ERROR in /api/anna-data: {str(e)}", file=sys.stderr)
@@ -209,7 +225,7 @@ def api_anna_words():
 def api_ml_data():
     try:
         processed_data = process_ml_data()
-        return jsonify(processed_data)
+        return api_json_response('ml-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -225,7 +241,7 @@ def api_grid_data():
         if not processed_data.get('grid_7x7') and not processed_data.get('error'):
             import sys
             print(f"WARNING: /api/grid-data returned empty data", file=sys.stderr)
-        return jsonify(processed_data)
+        return api_json_response('grid-data', processed_data)
     except Exception as e:
         import sys, traceback
         print(f"ERROR in /api/grid-data: {str(e)}", file=sys.stderr)
@@ -241,7 +257,7 @@ def api_grid_structure():
 def api_statistics_data():
     try:
         processed_data = process_statistics_data()
-        return jsonify(processed_data)
+        return api_json_response('statistics-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -254,7 +270,7 @@ def api_statistics():
 def api_discrepancy_data():
     try:
         processed_data = process_discrepancy_data()
-        return jsonify(processed_data)
+        return api_json_response('discrepancy-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -267,7 +283,7 @@ def api_discrepancy():
 def api_layers_data():
     try:
         processed_data = process_layer_data()
-        return jsonify(processed_data)
+        return api_json_response('layers-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -280,7 +296,7 @@ def api_layers():
 def api_helix_data():
     try:
         processed_data = process_helix_data()
-        return jsonify(processed_data)
+        return api_json_response('helix-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -293,7 +309,7 @@ def api_helix_gates():
 def api_dark_matter_data():
     try:
         processed_data = process_dark_matter_data()
-        return jsonify(processed_data)
+        return api_json_response('dark-matter-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -306,7 +322,7 @@ def api_dark_matter():
 def api_evolutionary_data():
     try:
         processed_data = process_evolutionary_data()
-        return jsonify(processed_data)
+        return api_json_response('evolutionary-data', processed_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -315,15 +331,77 @@ def api_evolutionary():
     return api_evolutionary_data()
 
 
+NEURAXON_DIR = DATA_DIR / 'neuraxon_exports'
+
+
+def load_frame_source():
+    """
+    Frame store if built (see scripts/build_neuraxon_store.py), otherwise the
+    JSON export; None if no network data is available.
+    """
+    try:
+        return get_frame_source(NEURAXON_DIR)
+    except Exception as e:
+        import sys
+        print(f"ERROR loading network data: {str(e)}", file=sys.stderr)
+        return None
+
+
+def parse_frame_range(value, frame_count):
+    """Parse ?frames=a-b (inclusive) or ?frames=a into a (start, stop) slice."""
+    if not value:
+        return 0, frame_count
+    
+    try:
+        if '-' in value:
+            first, last = value.split('-', 1)
+            start, stop = int(first), int(last) + 1
+        else:
+            start = int(value)
+            stop = start + 1
+    except ValueError:
+        raise ValueError(f"Invalid frame range: {value}")
+    
+    if start < 0 or stop <= start or start >= frame_count:
+        raise ValueError(f"Frame range {value} outside 0-{frame_count - 1}")
+    return start, min(stop, frame_count)
+
+
+FRAME_FORMATS = ('objects', 'columns')
+
+
+def parse_frame_format():
+    """?format=objects (default, one dict per node) or columns (one array per field)."""
+    value = request.args.get('format', 'objects')
+    if value not in FRAME_FORMATS:
+        raise ValueError(f"Unknown format: {value} (expected {' or '.join(FRAME_FORMATS)})")
+    return value == 'columns'
+
+
+def encode_frame(frame, fields, node_fields):
+    if isinstance(frame, ColumnarFrame):
+        return frame.to_json(fields, node_fields)
+    return select_frame_fields(frame, fields, node_fields)
+
+
+def parse_field_list(name, allowed):
+    """Parse a comma-separated field list, returned in canonical order."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    
+    requested = {v.strip() for v in value.split(',') if v.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(sorted(unknown))}")
+    return tuple(f for f in allowed if f in requested)
+
+
 @app.route('/api/neuraxon-data')
 def api_neuraxon_data():
-    # Try compressed file first (smaller for deployment)
-    network_file = DATA_DIR / 'neuraxon_exports' / 'real_ids_network.json.gz'
-    
-    if not network_file.exists():
-        network_file = DATA_DIR / 'neuraxon_exports' / 'real_ids_network.json'
+    source = load_frame_source()
     
-    if not network_file.exists():
+    if source is None:
         # Return empty structure - data should be loaded from external source or CDN
         return jsonify({
             'metadata': {
@@ -334,107 +412,218 @@ def api_neuraxon_data():
             'error': 'Network data not available. Data files are too large for serverless deployment and should be hosted externally.'
         })
     
-    # Handle compressed file
-    if network_file.suffix == '.gz':
-        import gzip
-        with gzip.open(network_file, 'rt') as f:
-            data = json.load(f)
-    else:
-        data = load_neuraxon_data(network_file)
+    try:
+        meta_only = request.args.get('meta', '').lower() in ('1', 'true', 'yes')
+        start, stop = parse_frame_range(request.args.get('frames'), source.frame_count)
+        fields = parse_field_list('fields', FRAME_FIELDS)
+        node_fields = parse_field_list('node_fields', NODE_FIELDS)
+        columnar = parse_frame_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if not data:
-        return jsonify({
+    # Metadata-only: frame count and per-frame stats, no node payloads
+    if meta_only:
+        return api_json_response('neuraxon-meta', lambda: {
             'metadata': {
-                'frames': [],
-                'total_nodes': 0,
-                'total_edges': 0
-            },
-            'error': 'Network data not available'
-        })
-    
-    frames = extract_frames(data)
-    stats = get_frame_statistics(frames)
+                'frames': source.frame_summaries(),
+                **source.statistics()
+            }
+        }, version=source.signature)
     
-    return jsonify({
+    cache_key = f"neuraxon-data:{start}-{stop}:{','.join(fields or ())}:{','.join(node_fields or ())}:{columnar}"
+    return api_json_response(cache_key, lambda: {
         'metadata': {
-            'frames': frames,
-            **stats
+            'frames': [encode_frame(f, fields, node_fields) for f in source.iter_frames(start, stop, columnar)],
+            'frame_range': [start, stop - 1],
+            **source.statistics()
         }
-    })
+    }, version=source.signature)
+
+
+@app.route('/api/neuraxon/frames/<int:index>')
+def api_neuraxon_frame(index):
+    source = load_frame_source()
+    if source is None:
+        return jsonify({'error': 'Network data not available'}), 404
+    
+    if index >= source.frame_count:
+        return jsonify({'error': f'Frame {index} not found', 'total_frames': source.frame_count}), 404
+    
+    try:
+        fields = parse_field_list('fields', FRAME_FIELDS)
+        node_fields = parse_field_list('node_fields', NODE_FIELDS)
+        columnar = parse_frame_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cache_key = f"neuraxon-frame:{index}:{','.join(fields or ())}:{','.join(node_fields or ())}:{columnar}"
+    return api_json_response(cache_key, lambda: {
+        'frame': encode_frame(source.read_frame(index, columnar), fields, node_fields),
+        'total_frames': source.frame_count
+    }, version=source.signature)
+
+
+def prepare_chat_request(security):
+    """
+    Checks shared by the chat routes.
+    
+    Returns (request state, None) or (None, error response): the state holds
+    the client ip, question, history and responder.
+    """
+    ip = security.get_client_ip()
+    
+    if security.is_blocked(ip):
+        return None, (jsonify({'error': 'Access denied'}), 403)
+    
+    allowed, error_msg = security.check_rate_limit(ip)
+    if not allowed:
+        return None, (jsonify({'error': error_msg}), 429)
+    
+    allowed, error_msg = security.check_cost_budget()
+    if not allowed:
+        return None, (jsonify({'error': error_msg}), 429)
+    
+    data = request.get_json()
+    if not data:
+        return None, (jsonify({'error': 'Invalid request'}), 400)
+    
+    question = data.get('question', '').strip()
+    conversation_history = data.get('history', [])
+    
+    if not question:
+        return None, (jsonify({'error': 'Question required'}), 400)
+    
+    question = security.sanitize_input(question)
+    if not question:
+        return None, (jsonify({'error': 'Invalid input'}), 400)
+    
+    from chatbot.engine import get_engine
+    try:
+        responder = get_engine().get_responder()
+    except (ValueError, ImportError) as e:
+        error_msg = str(e).lower()
+        if "not indexed" in error_msg or "database" in error_msg:
+            return None, (jsonify({'error': 'Chatbot database not initialized. Please run: python chatbot/index_codebase.py'}), 503)
+        elif "faiss" in error_msg or "not available" in error_msg:
+            return None, (jsonify({
+                'error': 'Chatbot not available',
+                'message': 'FAISS is not installed. Chatbot functionality requires faiss-cpu package.'
+            }), 503)
+        raise
+    
+    return {'ip': ip, 'question': question, 'history': conversation_history, 'responder': responder}, None
+
+
+def chat_unavailable(e):
+    return jsonify({
+        'error': 'Chatbot not available',
+        'message': f'Required dependencies not installed: {str(e)}. Install faiss-cpu or chromadb.'
+    }), 503
 
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     try:
-        from chatbot.retriever import CodeRetriever
-        from chatbot.responder import ChatbotResponder
         from chatbot.security import ChatbotSecurity
         
         security = ChatbotSecurity()
-        ip = security.get_client_ip()
-        
-        if security.is_blocked(ip):
-            return jsonify({'error': 'Access denied'}), 403
-        
-        allowed, error_msg = security.check_rate_limit(ip)
-        if not allowed:
-            return jsonify({'error': error_msg}), 429
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid request'}), 400
-        
-        question = data.get('question', '').strip()
-        conversation_history = data.get('history', [])
-        
-        if not question:
-            return jsonify({'error': 'Question required'}), 400
-        
-        question = security.sanitize_input(question)
-        if not question:
-            return jsonify({'error': 'Invalid input'}), 400
-        
-        try:
-            retriever = CodeRetriever()
-        except (ValueError, ImportError) as e:
-            error_msg = str(e).lower()
-            if "not indexed" in error_msg or "database" in error_msg:
-                return jsonify({'error': 'Chatbot database not initialized. Please run: python chatbot/index_codebase.py'}), 503
-            elif "faiss" in error_msg or "not available" in error_msg:
-                return jsonify({
-                    'error': 'Chatbot not available',
-                    'message': 'FAISS is not installed. Chatbot functionality requires faiss-cpu package.'
-                }), 503
-            raise
-        
-        # PathSanitizer will auto-detect qubic-anna-lab-public repository
-        # No need to pass repo_root - PathSanitizer finds it automatically
-        responder = ChatbotResponder(retriever, repo_root=None)
+        chat, error_response = prepare_chat_request(security)
+        if error_response:
+            return error_response
         
-        result = responder.generate_response(question, conversation_history, client_ip=ip)
+        result = chat['responder'].generate_response(chat['question'], chat['history'], client_ip=chat['ip'],
+                                                     check_cost=security.check_cost_budget)
         
+        if result.get('limited'):
+            return jsonify({'error': result['error']}), 429
         if 'error' in result:
             return jsonify(result), 500
         
-        cost_allowed, cost_error = security.check_cost_limit(ip, result.get('cost', 0))
+        cost_allowed, cost_error = security.check_cost_limit(chat['ip'], result.get('cost', 0))
         if not cost_allowed:
             return jsonify({'error': cost_error}), 429
         
         return jsonify({
             'answer': result['answer'],
             'sources': result.get('sources', []),
-            'tokens': result.get('tokens', {})
+            'tokens': result.get('tokens', {}),
+            'cached': result.get('cached', False)
         })
     
     except ImportError as e:
-        return jsonify({
-            'error': 'Chatbot not available',
-            'message': f'Required dependencies not installed: {str(e)}. Install faiss-cpu or chromadb.'
-        }), 503
+        return chat_unavailable(e)
     except Exception as e:
         return jsonify({'error': f'Chatbot error: {str(e)}'}), 500
 
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """
+    Chat answer as Server-Sent Events: 'sources', then 'token' events with
+    answer text as it is generated, then 'done' with the final answer and
+    token counts, or 'error'. Request checks fail with the same JSON errors
+    as /api/chat before the stream starts.
+    """
+    try:
+        from chatbot.security import ChatbotSecurity
+        
+        security = ChatbotSecurity()
+        chat, error_response = prepare_chat_request(security)
+        if error_response:
+            return error_response
+    except ImportError as e:
+        return chat_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': f'Chatbot error: {str(e)}'}), 500
+    
+    def generate():
+        # The worst-case cost is checked before anything is streamed, and the
+        # completion's cost is recorded when it ends, also if the client goes away
+        stream = chat['responder'].stream_response(
+            chat['question'], chat['history'], client_ip=chat['ip'],
+            check_cost=security.check_cost_budget,
+            record_cost=lambda cost: security.check_cost_limit(chat['ip'], cost)
+        )
+        try:
+            for event, data in stream:
+                if event == 'done':
+                    data = {
+                        'answer': data['answer'],
+                        'tokens': data.get('tokens', {}),
+                        'cached': data.get('cached', False)
+                    }
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event('error', {'error': f'Chatbot error: {str(e)}'})
+        finally:
+            stream.close()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Keep reverse proxies (nginx) from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def warm_up_chatbot():
+    """Load the chatbot index once at startup instead of on the first question."""
+    try:
+        from chatbot.engine import get_engine
+    except ImportError:
+        return False
+    return get_engine().warm_up()
+
+
+# Skip on serverless: cold starts should not pay for the index unless a chat request needs it
+IS_SERVERLESS = os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or os.environ.get('LAMBDA_TASK_ROOT')
+if os.getenv('CHATBOT_WARMUP', 'false' if IS_SERVERLESS else 'true').lower() == 'true':
+    warm_up_chatbot()
+
+
 if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', '5001'))
     app.run(debug=False, port=port, host='127.0.0.1')
@@ -2,6 +2,6 @@ from .indexer import CodeIndexer
 from .retriever import CodeRetriever
 from .responder import ChatbotResponder
 from .security import ChatbotSecurity
+from .engine import ChatbotEngine, get_engine
 
-__all__ = ['CodeIndexer', 'CodeRetriever', 'ChatbotResponder', 'ChatbotSecurity']
-
+__all__ = ['CodeIndexer', 'CodeRetriever', 'ChatbotResponder', 'ChatbotSecurity', 'ChatbotEngine', 'get_engine']
@@ -0,0 +1,134 @@
+"""
+Answer Cache
+In-process caches in front of the two paid calls of a chat request.
+
+QueryEmbeddingCache is a bounded LRU of normalized question -> query
+embedding. SemanticAnswerCache returns the stored answer and sources of an
+earlier question whose embedding is within max_distance (cosine) of the
+new one. Entries are keyed by the index version, so re-indexing
+invalidates both.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+QUERY_CACHE_SIZE = int(os.getenv('CHATBOT_QUERY_CACHE_SIZE', '1024'))
+ANSWER_CACHE_SIZE = int(os.getenv('CHATBOT_ANSWER_CACHE_SIZE', '512'))
+# Cosine distance under which two questions share an answer; 0 only matches identical embeddings
+ANSWER_CACHE_DISTANCE = float(os.getenv('CHATBOT_ANSWER_CACHE_DISTANCE', '0.05'))
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question."""
+    return re.sub(r'\s+', ' ', question).strip().rstrip('?!.').strip().lower()
+
+
+def unit_vector(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str], np.ndarray]' = OrderedDict()
+
+    def get(self, version: str, question: str) -> Optional[np.ndarray]:
+        key = (version, normalize_question(question))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, version: str, question: str, vector):
+        if self.max_entries <= 0:
+            return
+        key = (version, normalize_question(question))
+        with self._lock:
+            # Entries of older index versions can never hit again
+            for stale in [k for k in self._entries if k[0] != version]:
+                del self._entries[stale]
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SemanticAnswerCache:
+    """
+    Cached answers for questions asked without conversation history.
+
+    Lookups compare the query embedding against every cached one (a single
+    matrix product over at most max_entries vectors). Cached results are
+    shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, max_distance: float = ANSWER_CACHE_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[np.ndarray, Dict]]' = OrderedDict()
+        self._version = None
+        self._matrix = None
+        self._keys = []
+
+    def _reset(self, version: str):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self._matrix = None
+
+    def get(self, version: str, question: str, vector) -> Optional[Dict]:
+        if self.max_entries <= 0:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            self._reset(version)
+            entry = self._entries.get(key)
+            if entry is None and self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[k][0] for k in self._keys])
+                similarities = self._matrix @ unit_vector(vector)
+                best = int(np.argmax(similarities))
+                if 1.0 - similarities[best] <= self.max_distance:
+                    key = self._keys[best]
+                    entry = self._entries[key]
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, version: str, question: str, vector, result: Dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._reset(version)
+            key = normalize_question(question)
+            self._entries[key] = (unit_vector(vector), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+
+_query_cache = QueryEmbeddingCache()
+_answer_cache = SemanticAnswerCache()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Process-wide query embedding LRU."""
+    return _query_cache
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Process-wide semantic answer cache."""
+    return _answer_cache
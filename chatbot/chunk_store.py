@@ -0,0 +1,195 @@
+"""
+Chunk Store
+SQLite table of indexed chunks keyed by FAISS id, replacing metadata.json.
+
+The retriever fetches only the rows a search returns instead of loading
+every chunk's text at startup. An FTS5 table over code-aware terms of each
+chunk (see lexical) serves BM25 search. Rows also keep each chunk's token
+count and a token-truncated preview (see chunker.token_preview), so the
+responder budgets its prompt without tokenizing. The file is written once
+per build and swapped in atomically; readers open it read-only and
+immutable, which also works on read-only serverless filesystems.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from .lexical import code_terms, match_query
+
+STORE_FILENAME = 'chunks.sqlite3'
+LEGACY_METADATA_FILENAME = 'metadata.json'
+
+
+class ChunkStore:
+    """Read-only view of a chunk store; safe to share between threads and worker processes."""
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self._local = threading.local()
+        self.count()
+        # Stores written before token counts were kept lack the columns; their rows read as None
+        columns = {row[1] for row in self._connect().execute('PRAGMA table_info(chunks)')}
+        self._columns = 'faiss_id, doc_id, text, metadata, ' + (
+            'tokens, preview, preview_tokens' if 'tokens' in columns else 'NULL, NULL, NULL'
+        )
+        # Stores written before lexical search, or by an SQLite without FTS5, have no BM25 index
+        self.has_lexical = self._connect().execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'"
+        ).fetchone() is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            uri = f"file:{quote(str(self.db_file.resolve()))}?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _doc(row) -> Dict:
+        faiss_id, doc_id, text, metadata, tokens, preview, preview_tokens = row
+        return {'id': doc_id, 'text': text, 'metadata': json.loads(metadata), 'faiss_id': faiss_id,
+                'tokens': tokens, 'preview': preview, 'preview_tokens': preview_tokens}
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict]:
+        """Chunks by FAISS id; ids without a row are left out."""
+        ids = [int(i) for i in ids]
+        conn = self._connect()
+        docs = {}
+        # Stay below SQLite's default host parameter limit
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT {self._columns} FROM chunks WHERE faiss_id IN ({','.join('?' * len(part))})", part
+            )
+            docs.update((row[0], self._doc(row)) for row in rows)
+        return docs
+
+    def get(self, faiss_id: int) -> Optional[Dict]:
+        return self.get_many([faiss_id]).get(int(faiss_id))
+
+    def iter_docs(self) -> Iterator[Dict]:
+        """All chunks in FAISS id order."""
+        for row in self._connect().execute(f'SELECT {self._columns} FROM chunks ORDER BY faiss_id'):
+            yield self._doc(row)
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """(FAISS id, BM25 score) of the best lexical matches, best first; empty without a BM25 index."""
+        fts_query = match_query(query) if self.has_lexical else None
+        if fts_query is None:
+            return []
+        rows = self._connect().execute(
+            'SELECT rowid, bm25(chunks_fts) AS rank FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?',
+            (fts_query, limit)
+        )
+        # FTS5 reports bm25 negated so that ascending order is best first
+        return [(faiss_id, -rank) for faiss_id, rank in rows]
+
+
+def _doc_terms(doc: Dict) -> str:
+    metadata = doc.get('metadata', {})
+    return ' '.join(code_terms(' '.join([doc.get('text', ''), metadata.get('file', ''), metadata.get('name', '')])))
+
+
+def write_chunk_store(db_file: Path, docs: List[Dict]):
+    """
+    Write docs ({'id', 'text', 'metadata', 'faiss_id'} and optionally
+    'tokens', 'preview', 'preview_tokens') as a new store and swap it in
+    atomically. Docs without a faiss_id get their list position, as in
+    metadata.json files written before ids were stable.
+    """
+    db_file = Path(db_file)
+    # Unique per writer: workers migrating at once must not share a half-written file
+    fd, tmp_name = tempfile.mkstemp(prefix=db_file.name + '.', suffix='.tmp', dir=str(db_file.parent))
+    os.close(fd)
+    tmp_file = Path(tmp_name)
+
+    try:
+        _write_chunks(tmp_file, docs)
+        os.replace(tmp_file, db_file)
+    except BaseException:
+        tmp_file.unlink()
+        raise
+
+
+def _write_chunks(tmp_file: Path, docs: List[Dict]):
+    conn = sqlite3.connect(str(tmp_file))
+    try:
+        conn.execute(
+            'CREATE TABLE chunks (faiss_id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, '
+            'text TEXT NOT NULL, metadata TEXT NOT NULL, tokens INTEGER, preview TEXT, preview_tokens INTEGER)'
+        )
+        conn.executemany(
+            'INSERT INTO chunks (faiss_id, doc_id, text, metadata, tokens, preview, preview_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((doc.get('faiss_id', i), doc.get('id', str(i)), doc.get('text', ''), json.dumps(doc.get('metadata', {})),
+              doc.get('tokens'), doc.get('preview'), doc.get('preview_tokens'))
+             for i, doc in enumerate(docs))
+        )
+
+        try:
+            # Terms are tokenized here; '_' is a token character so whole identifiers stay one term
+            conn.execute(
+                "CREATE VIRTUAL TABLE chunks_fts USING fts5(terms, content='', tokenize=\"unicode61 tokenchars '_'\")"
+            )
+        except sqlite3.OperationalError as e:
+            print(f"WARNING: SQLite without FTS5 ({e}), lexical search disabled", file=sys.stderr)
+        else:
+            conn.executemany(
+                'INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)',
+                ((doc.get('faiss_id', i), _doc_terms(doc)) for i, doc in enumerate(docs))
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def migrate_metadata_json(db_path: Path, store_file: Path = None) -> Path:
+    """Convert db_path/metadata.json into a chunk store (default db_path/chunks.sqlite3)."""
+    db_path = Path(db_path)
+    store_file = Path(store_file) if store_file else db_path / STORE_FILENAME
+    with open(db_path / LEGACY_METADATA_FILENAME, 'r') as f:
+        docs = json.load(f)
+    write_chunk_store(store_file, docs)
+    return store_file
+
+
+def open_chunk_store(db_path: Path) -> Optional[ChunkStore]:
+    """
+    Chunk store of a FAISS database directory, or None if it has none.
+
+    A database that only has metadata.json is migrated on first open: next
+    to it where the directory is writable, otherwise (read-only deployments)
+    into the system temp dir, keyed by the JSON file's size and mtime.
+    """
+    db_path = Path(db_path)
+    store_file = db_path / STORE_FILENAME
+    if store_file.exists():
+        return ChunkStore(store_file)
+
+    metadata_file = db_path / LEGACY_METADATA_FILENAME
+    if not metadata_file.exists():
+        return None
+
+    try:
+        return ChunkStore(migrate_metadata_json(db_path))
+    except (OSError, sqlite3.Error):
+        stat = metadata_file.stat()
+        key = hashlib.sha256(f"{metadata_file.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+        tmp_store = Path(tempfile.gettempdir()) / f"neuraxon_chunks_{key}.sqlite3"
+        if not tmp_store.exists():
+            print(f"WARNING: {db_path} is read-only, migrating {LEGACY_METADATA_FILENAME} to {tmp_store}", file=sys.stderr)
+            migrate_metadata_json(db_path, tmp_store)
+        return ChunkStore(tmp_store)
@@ -0,0 +1,142 @@
+"""
+Chunker
+Token-aware splitting of source files into embedding chunks.
+
+Text is cut at format-specific boundaries (headings, blank lines, top-level
+definitions, CSS rules) and packed greedily up to max_tokens, repeating up to
+overlap tokens of trailing context at the start of the next chunk. Sizes are
+measured with the tiktoken encoding the indexer and responder use.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import tiktoken
+
+MAX_CHUNK_TOKENS = int(os.getenv('CHATBOT_CHUNK_TOKENS', '512'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHATBOT_CHUNK_OVERLAP_TOKENS', '64'))
+# Whole files below this size carry too little to be worth an embedding
+MIN_CHUNK_TOKENS = int(os.getenv('CHATBOT_MIN_CHUNK_TOKENS', '16'))
+# Leading tokens of each chunk stored as its preview; the responder's context cap per chunk
+PREVIEW_TOKENS = int(os.getenv('CHATBOT_CHUNK_CONTEXT_TOKENS', '80'))
+
+ENCODING_MODEL = "gpt-4o-mini"
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    return tiktoken.encoding_for_model(ENCODING_MODEL)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text))
+
+
+def token_preview(text: str, max_tokens: int = PREVIEW_TOKENS) -> Dict:
+    """Token count of text and its first max_tokens tokens as text, from one encoding pass."""
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    preview = text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return {'tokens': len(tokens), 'preview': preview, 'preview_tokens': min(len(tokens), max_tokens)}
+
+
+def pattern_boundaries(*patterns: str) -> Callable[[str], List[int]]:
+    """
+    Boundary detector from regexes: a segment starts where a match starts,
+    or, for patterns that consume a separator (a blank line, a closing
+    brace), right after it.
+    """
+    starts = [re.compile(p, re.MULTILINE) for p in patterns if p.startswith('^(?=')]
+    ends = [re.compile(p, re.MULTILINE) for p in patterns if not p.startswith('^(?=')]
+
+    def detect(text: str) -> List[int]:
+        offsets = {m.start() for p in starts for m in p.finditer(text)}
+        offsets.update(m.end() for p in ends for m in p.finditer(text))
+        return sorted(offsets)
+    return detect
+
+
+BLANK_LINE = r'\n[ \t]*\n'
+
+# Boundary detectors per format; add an entry to chunk a new file type
+BOUNDARIES: Dict[str, Callable[[str], List[int]]] = {
+    'text': pattern_boundaries(BLANK_LINE),
+    'markdown': pattern_boundaries(BLANK_LINE, r'^(?=#{1,6}\s)', r'^(?=```)'),
+    'python': pattern_boundaries(BLANK_LINE, r'^(?=[ \t]*(?:@|def\s|async\s+def\s|class\s))'),
+    'html': pattern_boundaries(
+        BLANK_LINE,
+        r'^(?=[ \t]*<(?:head|body|header|footer|nav|main|section|article|aside|div|form|table|ul|ol|script|style|h[1-6])\b)',
+    ),
+    'javascript': pattern_boundaries(
+        BLANK_LINE,
+        r'^(?=(?:export\s+)?(?:async\s+)?(?:function|class|const|let|var)\b)',
+        r'^\}[^\n]*\n',
+    ),
+    'css': pattern_boundaries(BLANK_LINE, r'^\}[ \t]*\n', r'^(?=@media\b)'),
+    'json': pattern_boundaries(r'^(?=[ \t]{0,2}"[^"\n]*"\s*:)', r'^[ \t]{0,2}[\]}],?[ \t]*\n'),
+}
+
+
+def _split(text: str, offsets: List[int]) -> List[str]:
+    bounds = [0] + [o for o in offsets if 0 < o < len(text)] + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _fit(segment: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Pieces of segment within max_tokens: whole, else by line, else by token window."""
+    tokens = get_encoding().encode(segment)
+    if len(tokens) <= max_tokens:
+        yield segment, len(tokens)
+        return
+
+    lines = segment.splitlines(keepends=True)
+    if len(lines) > 1:
+        for line in lines:
+            yield from _fit(line, max_tokens)
+        return
+
+    for i in range(0, len(tokens), max_tokens):
+        window = tokens[i:i + max_tokens]
+        yield get_encoding().decode(window), len(window)
+
+
+def iter_chunks(text: str, boundaries: Optional[Callable[[str], List[int]]] = None,
+                max_tokens: int = MAX_CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS) -> Iterator[str]:
+    """
+    Chunks of text, each at most max_tokens, cut at the detected boundaries.
+
+    A segment larger than max_tokens is cut at line ends, and a single line
+    larger than that at token boundaries. Each chunk after the first starts
+    with the trailing segments of the previous one, up to overlap tokens.
+    Whitespace-only chunks are dropped.
+    """
+    max_tokens = max(1, max_tokens)
+    overlap = min(overlap, max_tokens // 2)
+    offsets = boundaries(text) if boundaries is not None else []
+
+    chunk: List[Tuple[str, int]] = []
+    chunk_tokens = 0
+    for segment in _split(text, offsets):
+        for piece, tokens in _fit(segment, max_tokens):
+            if chunk and chunk_tokens + tokens > max_tokens:
+                body = ''.join(p for p, _ in chunk)
+                if body.strip():
+                    yield body
+
+                carried: List[Tuple[str, int]] = []
+                carried_tokens = 0
+                for p, t in reversed(chunk):
+                    if carried_tokens + t > overlap or carried_tokens + t + tokens > max_tokens:
+                        break
+                    carried.insert(0, (p, t))
+                    carried_tokens += t
+                chunk, chunk_tokens = carried, carried_tokens
+
+            chunk.append((piece, tokens))
+            chunk_tokens += tokens
+
+    body = ''.join(p for p, _ in chunk)
+    if body.strip():
+        yield body
@@ -0,0 +1,138 @@
+"""
+Embedding Batcher
+Packs texts into token-budgeted requests, keeps a bounded number of them in
+flight and retries rate limits and transient errors with exponential backoff.
+
+Results are returned in input order. Texts that cannot be embedded come back
+as None, never as placeholder vectors.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Sequence
+
+import openai
+
+# OpenAI caps a request at 2048 inputs and 300k tokens in total
+MAX_BATCH_TOKENS = int(os.getenv('CHATBOT_EMBED_BATCH_TOKENS', '100000'))
+MAX_BATCH_ITEMS = int(os.getenv('CHATBOT_EMBED_BATCH_ITEMS', '2048'))
+MAX_IN_FLIGHT = int(os.getenv('CHATBOT_EMBED_CONCURRENCY', '4'))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def pack_batches(token_counts: Sequence[int], max_tokens: int = MAX_BATCH_TOKENS,
+                 max_items: int = MAX_BATCH_ITEMS) -> List[List[int]]:
+    """Group text indices into consecutive batches within the token and item limits."""
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingBatcher:
+    def __init__(self, client, model: str, max_tokens: int = MAX_BATCH_TOKENS,
+                 max_items: int = MAX_BATCH_ITEMS, max_in_flight: int = MAX_IN_FLIGHT,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        # Retries are handled here, with backoff shared by all batches
+        self.client = client.with_options(max_retries=0) if hasattr(client, 'with_options') else client
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._print_lock = threading.Lock()
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_delay)
+        except ValueError:
+            pass
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.embeddings.create(model=self.model, input=texts)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                with self._print_lock:
+                    print(f"  {type(e).__name__}, retrying {len(texts)} texts in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _embed_batch(self, texts: List[str], labels: List[str]) -> List[Optional[List[float]]]:
+        try:
+            return self._request(texts)
+        except openai.BadRequestError as e:
+            # A text the token counts did not catch; split to isolate it
+            if len(texts) == 1:
+                with self._print_lock:
+                    print(f"  Skipping chunk {labels[0]}: {e}")
+                return [None]
+            middle = len(texts) // 2
+            return (self._embed_batch(texts[:middle], labels[:middle])
+                    + self._embed_batch(texts[middle:], labels[middle:]))
+
+    def embed(self, texts: Sequence[str], token_counts: Sequence[int],
+              labels: Sequence[str] = None, on_batch=None) -> List[Optional[List[float]]]:
+        """
+        Embed texts in input order. token_counts are the per-text token counts
+        used for packing; labels only name failed texts in the log.
+
+        on_batch(indices, vectors) is called as each batch completes, e.g. to
+        cache it. If a batch exhausts its retries, the remaining batches still
+        finish (and reach on_batch) before its error is raised.
+        """
+        labels = list(labels) if labels is not None else [str(i) for i in range(len(texts))]
+        batches = pack_batches(token_counts, self.max_tokens, self.max_items)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        done = 0
+        error = None
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_in_flight)) as pool:
+            futures = {
+                pool.submit(self._embed_batch, [texts[i] for i in batch], [labels[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                for i, vector in zip(batch, vectors):
+                    results[i] = vector
+                if on_batch is not None:
+                    on_batch(batch, vectors)
+                done += len(batch)
+                with self._print_lock:
+                    print(f"Processed {done}/{len(texts)} chunks ({len(batches)} requests)")
+
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,144 @@
+"""
+Embedding Cache
+Local store of embedding vectors shared by the indexers and the retriever.
+
+Vectors are keyed by sha256(text), model and dimension and stored as float32
+blobs in SQLite. Hits refresh last_used; beyond max_entries the least
+recently used vectors are evicted.
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+MAX_ENTRIES = int(os.getenv('CHATBOT_EMBEDDING_CACHE_MAX_ENTRIES', '20000'))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed cache; safe to share between threads and worker processes."""
+
+    EVICT_EVERY = 500
+
+    def __init__(self, db_file: Path, max_entries: int = MAX_ENTRIES):
+        self.db_file = Path(db_file)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'hash TEXT NOT NULL, model TEXT NOT NULL, dim INTEGER NOT NULL, '
+                'vector BLOB NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (hash, model, dim))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_file), timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, texts: Sequence[str], model: str, dim: int) -> List[Optional[np.ndarray]]:
+        """Cached vectors in the order of texts, None where missing."""
+        hashes = [text_hash(t) for t in texts]
+        conn = self._connect()
+        found = {}
+        # Stay below SQLite's default host parameter limit
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            rows = conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND dim = ? AND hash IN ({','.join('?' * len(part))})",
+                [model, dim] + part
+            )
+            found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+
+        if found:
+            now = time.time()
+            conn.executemany(
+                'UPDATE embeddings SET last_used = ? WHERE hash = ? AND model = ? AND dim = ?',
+                [(now, h, model, dim) for h in found]
+            )
+        return [found.get(h) for h in hashes]
+
+    def get(self, text: str, model: str, dim: int) -> Optional[np.ndarray]:
+        return self.get_many([text], model, dim)[0]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]], model: str, dim: int):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            if vector.shape != (dim,):
+                continue
+            rows.append((text_hash(text), model, dim, vector.tobytes(), now))
+
+        conn = self._connect()
+        conn.executemany(
+            'INSERT OR REPLACE INTO embeddings (hash, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)', rows
+        )
+
+        self._puts += len(rows)
+        if self._puts >= self.EVICT_EVERY:
+            self._puts = 0
+            self.evict()
+
+    def put(self, text: str, vector: Sequence[float], model: str, dim: int):
+        self.put_many([text], [vector], model, dim)
+
+    def evict(self):
+        """Drop the least recently used vectors beyond max_entries."""
+        conn = self._connect()
+        count = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM embeddings WHERE rowid IN '
+                '(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache, or None if it cannot be opened (embeddings are then
+    always requested from the API).
+
+    CHATBOT_EMBEDDING_CACHE_DB: SQLite file, defaults to the system temp dir
+    (writable on serverless as well); set it to 'off' to disable the cache
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                db_file = os.getenv('CHATBOT_EMBEDDING_CACHE_DB') or (Path(tempfile.gettempdir()) / 'neuraxon_chatbot_embeddings.sqlite3')
+                if str(db_file).lower() == 'off':
+                    _default_cache = False
+                else:
+                    try:
+                        _default_cache = EmbeddingCache(db_file)
+                    except sqlite3.Error as e:
+                        print(f"WARNING: Embedding cache unavailable ({e}), embeddings will not be cached", file=sys.stderr)
+                        _default_cache = False
+    return _default_cache or None
@@ -0,0 +1,97 @@
+"""
+Chatbot Engine
+Process-wide holder for the retriever/responder pair so the FAISS index,
+metadata, OpenAI clients and path cache are loaded once per worker.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .retriever import CodeRetriever
+from .responder import ChatbotResponder
+
+
+class ChatbotEngine:
+    def __init__(self, db_path: Path = None, repo_root: Path = None):
+        """
+        Args:
+            db_path: FAISS database directory, defaults to CodeRetriever's
+            repo_root: Repository root for source links, auto-detected if None
+        """
+        self.db_path = db_path
+        self.repo_root = repo_root
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._retriever = None
+        self._responder = None
+
+    def _load(self):
+        retriever = CodeRetriever(self.db_path)
+        responder = ChatbotResponder(retriever, repo_root=self.repo_root)
+        return retriever, responder
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._responder is not None
+
+    @property
+    def retriever(self) -> CodeRetriever:
+        self.get_responder()
+        return self._retriever
+
+    def get_responder(self) -> ChatbotResponder:
+        """
+        Return the shared responder, loading it on first use.
+
+        Raises the same ValueError/ImportError as CodeRetriever when the
+        database or dependencies are missing; failures are not cached so the
+        next call retries.
+        """
+        responder = self._responder
+        if responder is not None:
+            return responder
+
+        with self._lock:
+            if self._responder is None:
+                self._retriever, self._responder = self._load()
+                self.loaded_at = time.time()
+            return self._responder
+
+    def reload(self) -> ChatbotResponder:
+        """
+        Rebuild retriever and responder, e.g. after re-indexing.
+
+        The new pair is loaded before the swap, so in-flight requests keep
+        using the old one and never see a half-loaded engine.
+        """
+        retriever, responder = self._load()
+        with self._lock:
+            self._retriever, self._responder = retriever, responder
+            self.loaded_at = time.time()
+        return responder
+
+    def warm_up(self) -> bool:
+        """Load the engine eagerly. Returns False instead of raising."""
+        try:
+            self.get_responder()
+            return True
+        except Exception as e:
+            print(f"WARNING: Chatbot warm-up failed: {e}", file=sys.stderr)
+            return False
+
+
+_engine: Optional[ChatbotEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ChatbotEngine:
+    """Return the process-wide chatbot engine."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ChatbotEngine()
+    return _engine
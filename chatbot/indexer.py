@@ -1,7 +1,11 @@
 import os
 import ast
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import faiss
 import numpy as np
 import json
@@ -9,25 +13,137 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import tiktoken
 
+from .chunk_store import LEGACY_METADATA_FILENAME, STORE_FILENAME, open_chunk_store, write_chunk_store
+from .chunker import BOUNDARIES, MAX_CHUNK_TOKENS, MIN_CHUNK_TOKENS, count_tokens, iter_chunks, token_preview
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import get_embedding_cache
+from .vector_index import (build_index, choose_index_config, load_index_config, needs_rebuild,
+                           prepare_vectors, reconstruct_vectors, write_index_config)
+
 load_dotenv()
 
-class CodeIndexer:
-    def __init__(self, repo_path: Path, db_path: Path = None):
+# Bump when the manifest layout changes; older manifests trigger a full rebuild
+MANIFEST_VERSION = 2
+
+# Directory names, or paths relative to the repository root, that are never walked into
+EXCLUDED_DIRS = {'faiss_db', 'chroma_db', '__pycache__', '.git', 'node_modules', 'venv', 'env', '.venv', 'static/vendor', 'static/images', 'static/fonts', 'repos', 'outputs', 'data/neuraxon_exports'}
+EXCLUDED_FILES = {'.gitignore', 'FETCH_HEAD', 'requirements.txt', 'package-lock.json', 'package.json'}
+EXCLUDED_PATTERNS = ['_PLAN.md', '_ANALYSIS.md', 'TROUBLESHOOTING.md', 'TESTING.md', 'SECURITY_WARNING.md', 'VERCEL_DEPLOY.md']
+
+# Extractor per file extension; extract_code_info dispatches further by suffix
+EXTRACTORS = {
+    '.py': 'extract_code_info',
+    '.md': 'extract_code_info',
+    '.txt': 'extract_markdown_info',
+    '.html': 'extract_code_info',
+    '.js': 'extract_code_info',
+    '.css': 'extract_code_info',
+    '.json': 'extract_code_info',
+}
+
+INDEX_WORKERS = int(os.getenv('CHATBOT_INDEX_WORKERS', str(os.cpu_count() or 1)))
+# Below this many files, starting worker processes costs more than it saves
+PARALLEL_MIN_FILES = 32
+
+
+def is_excluded_dir(rel_path: str) -> bool:
+    name = rel_path.rsplit('/', 1)[-1]
+    return name in EXCLUDED_DIRS or any(
+        rel_path == excluded or rel_path.endswith('/' + excluded)
+        for excluded in EXCLUDED_DIRS if '/' in excluded
+    )
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunks_digest(docs: Iterable[Dict]) -> str:
+    """Hash of every chunk's FAISS id, doc id and text; ties a manifest to the chunk store written with it."""
+    entries = sorted((doc['faiss_id'], doc['id'], content_hash(doc['text'])) for doc in docs)
+    return content_hash(json.dumps(entries))
+
+
+def class_outline(content: str, node: ast.ClassDef) -> str:
+    """Source of a class with method bodies elided; the methods are chunks of their own."""
+    lines = content.splitlines()
+    elided = {}
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body_start = child.body[0].lineno
+            if body_start > child.lineno:
+                elided[body_start] = child.end_lineno
+    
+    outline = []
+    lineno = node.lineno
+    while lineno <= node.end_lineno:
+        if lineno in elided:
+            line = lines[lineno - 1]
+            outline.append(line[:len(line) - len(line.lstrip())] + '...')
+            lineno = elided[lineno] + 1
+            continue
+        outline.append(lines[lineno - 1])
+        lineno += 1
+    return '\n'.join(outline)
+
+
+class SourceExtractor:
+    """
+    Chunk extraction per file type.
+    
+    Only holds the repository path, so it can be rebuilt in worker processes.
+    """
+    
+    def __init__(self, repo_path: Path):
         self.repo_path = repo_path
-        self.db_path = db_path or (Path(__file__).parent.parent / 'faiss_db')
-        self.db_path.mkdir(exist_ok=True)
-        
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not set in environment")
-        
-        self.openai_client = OpenAI(api_key=api_key)
-        self.encoding = tiktoken.encoding_for_model("gpt-4o-mini")
-        self.embedding_dim = 1536  # text-embedding-3-small dimension
-        
-        # FAISS index (will be created during indexing)
-        self.index = None
-        self.metadata = []
+    
+    def file_rel(self, file_path: Path) -> str:
+        file_rel = str(file_path.relative_to(self.repo_path))
+        if file_rel.startswith('web/'):
+            file_rel = file_rel[4:]
+        return file_rel
+    
+    def make_chunks(self, file_rel: str, chunk_type: str, name: str, title: str, body: str,
+                    boundaries: str, prefix: str = '\n\n', docstring: str = '') -> List[Dict]:
+        """
+        Chunks of body, each within MAX_CHUNK_TOKENS including its title line.
+        
+        A body that fits is one chunk named name with text "{title}:{prefix}{body}";
+        otherwise the parts are named name_part0, name_part1, ... and titled
+        "{title} (part n)".
+        """
+        header_tokens = count_tokens(f"{title} (part 999):{prefix}")
+        budget = max(MAX_CHUNK_TOKENS - header_tokens, MAX_CHUNK_TOKENS // 4)
+        parts = list(iter_chunks(body, BOUNDARIES[boundaries], budget))
+        
+        chunks = []
+        for n, part in enumerate(parts):
+            if len(parts) == 1:
+                part_name, part_title = name, title
+            else:
+                part_name, part_title = f"{name}_part{n}", f"{title} (part {n + 1})"
+            
+            text = f"{part_title}:{prefix}{part}"
+            chunks.append(dict({
+                'file': file_rel,
+                'type': chunk_type,
+                'name': part_name,
+                'code': part,
+                'docstring': docstring,
+                'text': text,
+            }, **token_preview(text)))
+        return chunks
+    
+    def chunk_document(self, file_path: Path, chunk_type: str, label: str, boundaries: str) -> List[Dict]:
+        """Chunks of a whole text file; files below MIN_CHUNK_TOKENS are skipped."""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        chunks = self.make_chunks(self.file_rel(file_path), chunk_type, file_path.stem,
+                                  f"{label} {file_path.name}", content, boundaries)
+        if len(chunks) == 1 and count_tokens(chunks[0]['code']) < MIN_CHUNK_TOKENS:
+            return []
+        return chunks
     
     def extract_code_info(self, file_path: Path) -> List[Dict]:
         if not file_path.exists():
@@ -56,59 +172,28 @@ class CodeIndexer:
                 content = f.read()
             
             tree = ast.parse(content)
+            file_rel = self.file_rel(file_path)
             chunks = []
             
             for node in ast.walk(tree):
                 if isinstance(node, ast.FunctionDef):
                     docstring = ast.get_docstring(node) or ""
                     code_snippet = ast.get_source_segment(content, node) or ""
-                    
-                    file_rel = str(file_path.relative_to(self.repo_path))
-                    if file_rel.startswith('web/'):
-                        file_rel = file_rel[4:]
-                    
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'function',
-                        'name': node.name,
-                        'code': code_snippet[:1000],
-                        'docstring': docstring,
-                        'text': f"Function {node.name} in {file_path.name}:\n{docstring}\n\nCode:\n{code_snippet[:500]}"
-                    }
-                    chunks.append(chunk)
+                    chunks.extend(self.make_chunks(
+                        file_rel, 'function', node.name, f"Function {node.name} in {file_path.name}",
+                        code_snippet, 'python', prefix=f"\n{docstring}\n\nCode:\n", docstring=docstring
+                    ))
                 
                 elif isinstance(node, ast.ClassDef):
                     docstring = ast.get_docstring(node) or ""
-                    code_snippet = ast.get_source_segment(content, node) or ""
-                    
-                    file_rel = str(file_path.relative_to(self.repo_path))
-                    if file_rel.startswith('web/'):
-                        file_rel = file_rel[4:]
-                    
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'class',
-                        'name': node.name,
-                        'code': code_snippet[:1000],
-                        'docstring': docstring,
-                        'text': f"Class {node.name} in {file_path.name}:\n{docstring}\n\nCode:\n{code_snippet[:500]}"
-                    }
-                    chunks.append(chunk)
+                    chunks.extend(self.make_chunks(
+                        file_rel, 'class', node.name, f"Class {node.name} in {file_path.name}",
+                        class_outline(content, node), 'python', prefix=f"\n{docstring}\n\nCode:\n", docstring=docstring
+                    ))
             
             if not chunks:
-                file_rel = str(file_path.relative_to(self.repo_path))
-                if file_rel.startswith('web/'):
-                    file_rel = file_rel[4:]
-                
-                chunk = {
-                    'file': file_rel,
-                    'type': 'file',
-                    'name': file_path.name,
-                    'code': content[:1000],
-                    'docstring': '',
-                    'text': f"File {file_path.name}:\n{content[:500]}"
-                }
-                chunks.append(chunk)
+                chunks = self.make_chunks(file_rel, 'file', file_path.name, f"File {file_path.name}",
+                                          content, 'python', prefix='\n')
             
             return chunks
         
@@ -117,191 +202,22 @@ class CodeIndexer:
     
     def extract_markdown_info(self, file_path: Path) -> List[Dict]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if len(content) < 50:
-                return []
-            
-            file_rel = str(file_path.relative_to(self.repo_path))
-            if file_rel.startswith('web/'):
-                file_rel = file_rel[4:]
-            
-            max_chunk_size = 1500
-            chunks = []
-            
-            if len(content) <= max_chunk_size:
-                chunk = {
-                    'file': file_rel,
-                    'type': 'documentation',
-                    'name': file_path.stem,
-                    'code': content,
-                    'docstring': '',
-                    'text': f"Documentation file {file_path.name}:\n\n{content}"
-                }
-                chunks.append(chunk)
-            else:
-                parts = content.split('\n\n')
-                current_chunk = ""
-                chunk_num = 0
-                
-                for part in parts:
-                    if len(current_chunk) + len(part) > max_chunk_size and current_chunk:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'documentation',
-                            'name': f"{file_path.stem}_part{chunk_num}",
-                            'code': current_chunk,
-                            'docstring': '',
-                            'text': f"Documentation file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                        }
-                        chunks.append(chunk)
-                        current_chunk = part
-                        chunk_num += 1
-                    else:
-                        current_chunk += "\n\n" + part if current_chunk else part
-                
-                if current_chunk:
-                    file_rel = str(file_path.relative_to(self.repo_path))
-                    if file_rel.startswith('web/'):
-                        file_rel = file_rel[4:]
-                    
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'documentation',
-                        'name': f"{file_path.stem}_part{chunk_num}",
-                        'code': current_chunk,
-                        'docstring': '',
-                        'text': f"Documentation file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                    }
-                    chunks.append(chunk)
-            
-            return chunks
+            return self.chunk_document(file_path, 'documentation', 'Documentation file', 'markdown')
         except Exception:
             return []
     
     def extract_html_info(self, file_path: Path) -> List[Dict]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if len(content) < 50:
-                return []
-            
-            file_rel = str(file_path.relative_to(self.repo_path))
-            if file_rel.startswith('web/'):
-                file_rel = file_rel[4:]
-            
-            max_chunk_size = 1500
-            chunks = []
-            
-            if len(content) <= max_chunk_size:
-                chunk = {
-                    'file': file_rel,
-                    'type': 'html_template',
-                    'name': file_path.stem,
-                    'code': content,
-                    'docstring': '',
-                    'text': f"HTML template {file_path.name}:\n\n{content}"
-                }
-                chunks.append(chunk)
-            else:
-                parts = content.split('\n\n')
-                current_chunk = ""
-                chunk_num = 0
-                
-                for part in parts:
-                    if len(current_chunk) + len(part) > max_chunk_size and current_chunk:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'html_template',
-                            'name': f"{file_path.stem}_part{chunk_num}",
-                            'code': current_chunk,
-                            'docstring': '',
-                            'text': f"HTML template {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                        }
-                        chunks.append(chunk)
-                        current_chunk = part
-                        chunk_num += 1
-                    else:
-                        current_chunk += "\n\n" + part if current_chunk else part
-                
-                if current_chunk:
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'html_template',
-                        'name': f"{file_path.stem}_part{chunk_num}",
-                        'code': current_chunk,
-                        'docstring': '',
-                        'text': f"HTML template {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                    }
-                    chunks.append(chunk)
-            
-            return chunks
+            return self.chunk_document(file_path, 'html_template', 'HTML template', 'html')
         except Exception:
             return []
     
     def extract_javascript_info(self, file_path: Path) -> List[Dict]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if len(content) < 50:
-                return []
-            
-            file_rel = str(file_path.relative_to(self.repo_path))
-            if file_rel.startswith('web/'):
-                file_rel = file_rel[4:]
-            
-            max_chunk_size = 1500
-            chunks = []
-            
             if file_path.name == 'popups.js':
-                return self.extract_popups_js_info(file_path, file_rel)
-            
-            if len(content) <= max_chunk_size:
-                chunk = {
-                    'file': file_rel,
-                    'type': 'javascript',
-                    'name': file_path.stem,
-                    'code': content,
-                    'docstring': '',
-                    'text': f"JavaScript file {file_path.name}:\n\n{content}"
-                }
-                chunks.append(chunk)
-            else:
-                parts = content.split('\n\n')
-                current_chunk = ""
-                chunk_num = 0
-                
-                for part in parts:
-                    if len(current_chunk) + len(part) > max_chunk_size and current_chunk:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'javascript',
-                            'name': f"{file_path.stem}_part{chunk_num}",
-                            'code': current_chunk,
-                            'docstring': '',
-                            'text': f"JavaScript file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                        }
-                        chunks.append(chunk)
-                        current_chunk = part
-                        chunk_num += 1
-                    else:
-                        current_chunk += "\n\n" + part if current_chunk else part
-                
-                if current_chunk:
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'javascript',
-                        'name': f"{file_path.stem}_part{chunk_num}",
-                        'code': current_chunk,
-                        'docstring': '',
-                        'text': f"JavaScript file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                    }
-                    chunks.append(chunk)
+                return self.extract_popups_js_info(file_path, self.file_rel(file_path))
             
-            return chunks
+            return self.chunk_document(file_path, 'javascript', 'JavaScript file', 'javascript')
         except Exception:
             return []
     
@@ -326,52 +242,13 @@ class CodeIndexer:
                 popup_title = match.group(2)
                 popup_content = match.group(3)
                 
-                max_content_len = 1000
-                if len(popup_content) > max_content_len:
-                    popup_content = popup_content[:max_content_len] + "..."
-                
-                chunk = {
-                    'file': file_rel,
-                    'type': 'javascript',
-                    'name': f"popup_{popup_id}",
-                    'code': popup_content[:500],
-                    'docstring': popup_title,
-                    'text': f"Popup: {popup_id}\nTitle: {popup_title}\n\n{popup_content}"
-                }
-                chunks.append(chunk)
+                chunks.extend(self.make_chunks(
+                    file_rel, 'javascript', f"popup_{popup_id}", f"Popup: {popup_id}\nTitle",
+                    popup_content, 'html', prefix=f" {popup_title}\n\n", docstring=popup_title
+                ))
             
             if not chunks:
-                max_chunk_size = 1000
-                parts = content.split("'")
-                current_chunk = ""
-                chunk_num = 0
-                
-                for i, part in enumerate(parts):
-                    if len(current_chunk) + len(part) > max_chunk_size and current_chunk:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'javascript',
-                            'name': f"{file_path.stem}_part{chunk_num}",
-                            'code': current_chunk,
-                            'docstring': '',
-                            'text': f"JavaScript file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                        }
-                        chunks.append(chunk)
-                        current_chunk = part
-                        chunk_num += 1
-                    else:
-                        current_chunk += "'" + part if current_chunk else part
-                
-                if current_chunk:
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'javascript',
-                        'name': f"{file_path.stem}_part{chunk_num}",
-                        'code': current_chunk,
-                        'docstring': '',
-                        'text': f"JavaScript file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                    }
-                    chunks.append(chunk)
+                return self.chunk_document(file_path, 'javascript', 'JavaScript file', 'javascript')
             
             return chunks
         except Exception:
@@ -379,343 +256,353 @@ class CodeIndexer:
     
     def extract_css_info(self, file_path: Path) -> List[Dict]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if len(content) < 50:
-                return []
-            
-            file_rel = str(file_path.relative_to(self.repo_path))
-            if file_rel.startswith('web/'):
-                file_rel = file_rel[4:]
-            
-            max_chunk_size = 1500
-            chunks = []
-            
-            if len(content) <= max_chunk_size:
-                chunk = {
-                    'file': file_rel,
-                    'type': 'css',
-                    'name': file_path.stem,
-                    'code': content,
-                    'docstring': '',
-                    'text': f"CSS file {file_path.name}:\n\n{content}"
-                }
-                chunks.append(chunk)
-            else:
-                parts = content.split('\n\n')
-                current_chunk = ""
-                chunk_num = 0
-                
-                for part in parts:
-                    if len(current_chunk) + len(part) > max_chunk_size and current_chunk:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'css',
-                            'name': f"{file_path.stem}_part{chunk_num}",
-                            'code': current_chunk,
-                            'docstring': '',
-                            'text': f"CSS file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                        }
-                        chunks.append(chunk)
-                        current_chunk = part
-                        chunk_num += 1
-                    else:
-                        current_chunk += "\n\n" + part if current_chunk else part
-                
-                if current_chunk:
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'css',
-                        'name': f"{file_path.stem}_part{chunk_num}",
-                        'code': current_chunk,
-                        'docstring': '',
-                        'text': f"CSS file {file_path.name} (part {chunk_num + 1}):\n\n{current_chunk}"
-                    }
-                    chunks.append(chunk)
-            
-            return chunks
+            return self.chunk_document(file_path, 'css', 'CSS file', 'css')
         except Exception:
             return []
     
     def extract_json_info(self, file_path: Path) -> List[Dict]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if len(content) < 50:
-                return []
-            
-            file_rel = str(file_path.relative_to(self.repo_path))
-            if file_rel.startswith('web/'):
-                file_rel = file_rel[4:]
+            chunks = self.chunk_document(file_path, 'json_data', 'JSON data file', 'json')
+            if len(chunks) <= 1:
+                return chunks
             
-            max_chunk_size = 1500
+            # Too large for one chunk: chunk large objects per top-level key
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                return chunks
+            if not isinstance(data, dict):
+                return chunks
+            
+            file_rel = self.file_rel(file_path)
             chunks = []
-            
-            if len(content) <= max_chunk_size:
-                chunk = {
-                    'file': file_rel,
-                    'type': 'json_data',
-                    'name': file_path.stem,
-                    'code': content,
-                    'docstring': '',
-                    'text': f"JSON data file {file_path.name}:\n\n{content}"
-                }
-                chunks.append(chunk)
-            else:
-                import json
-                try:
-                    data = json.loads(content)
-                    if isinstance(data, dict):
-                        for key, value in list(data.items())[:20]:
-                            chunk = {
-                                'file': file_rel,
-                                'type': 'json_data',
-                                'name': f"{file_path.stem}_{key}",
-                                'code': json.dumps({key: value}, indent=2),
-                                'docstring': '',
-                                'text': f"JSON data file {file_path.name}, key '{key}':\n\n{json.dumps({key: value}, indent=2)}"
-                            }
-                            chunks.append(chunk)
-                    else:
-                        chunk = {
-                            'file': file_rel,
-                            'type': 'json_data',
-                            'name': file_path.stem,
-                            'code': content[:max_chunk_size],
-                            'docstring': '',
-                            'text': f"JSON data file {file_path.name}:\n\n{content[:max_chunk_size]}"
-                        }
-                        chunks.append(chunk)
-                except:
-                    chunk = {
-                        'file': file_rel,
-                        'type': 'json_data',
-                        'name': file_path.stem,
-                        'code': content[:max_chunk_size],
-                        'docstring': '',
-                        'text': f"JSON data file {file_path.name}:\n\n{content[:max_chunk_size]}"
-                    }
-                    chunks.append(chunk)
-            
+            for key, value in list(data.items())[:20]:
+                chunks.extend(self.make_chunks(
+                    file_rel, 'json_data', f"{file_path.stem}_{key}", f"JSON data file {file_path.name}, key '{key}'",
+                    json.dumps({key: value}, indent=2), 'json'
+                ))
             return chunks
         except Exception:
             return []
-    
-    def index_repository(self):
-        python_files = list(self.repo_path.rglob('*.py'))
-        md_files = list(self.repo_path.rglob('*.md'))
-        txt_files = list(self.repo_path.rglob('*.txt'))
-        html_files = list(self.repo_path.rglob('*.html'))
-        js_files = list(self.repo_path.rglob('*.js'))
-        css_files = list(self.repo_path.rglob('*.css'))
-        json_files = list(self.repo_path.rglob('*.json'))
-        all_chunks = []
-        
-        excluded_dirs = {'faiss_db', 'chroma_db', '__pycache__', '.git', 'node_modules', 'venv', 'env', '.venv', 'static/vendor', 'static/images', 'static/fonts', 'repos', 'outputs', 'data/neuraxon_exports'}
-        excluded_files = {'.gitignore', 'FETCH_HEAD', 'requirements.txt', 'package-lock.json', 'package.json'}
-        excluded_patterns = ['_PLAN.md', '_ANALYSIS.md', 'TROUBLESHOOTING.md', 'TESTING.md', 'SECURITY_WARNING.md', 'VERCEL_DEPLOY.md']
-        
-        print(f"Found {len(python_files)} Python files, {len(md_files)} Markdown files, {len(txt_files)} text files")
-        print(f"Found {len(html_files)} HTML files, {len(js_files)} JavaScript files, {len(css_files)} CSS files, {len(json_files)} JSON files")
-        
-        for py_file in python_files:
-            if any(excluded in str(py_file) for excluded in excluded_dirs):
-                continue
-            if py_file.name in excluded_files:
-                continue
-            if any(pattern in py_file.name for pattern in excluded_patterns):
-                continue
-            
-            chunks = self.extract_code_info(py_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {py_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+
+
+def _extract_file(job) -> List[Dict]:
+    repo_path, file_path, method = job
+    return getattr(SourceExtractor(repo_path), method)(file_path)
+
+
+class CodeIndexer(SourceExtractor):
+    def __init__(self, repo_path: Path, db_path: Path = None):
+        super().__init__(repo_path)
+        self.db_path = db_path or (Path(__file__).parent.parent / 'faiss_db')
+        self.db_path.mkdir(exist_ok=True)
         
-        for md_file in md_files:
-            if any(excluded in str(md_file) for excluded in excluded_dirs):
-                continue
-            if md_file.name in excluded_files:
-                continue
-            if any(pattern in md_file.name for pattern in excluded_patterns):
-                continue
-            
-            chunks = self.extract_code_info(md_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {md_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not set in environment")
         
-        for txt_file in txt_files:
-            if any(excluded in str(txt_file) for excluded in excluded_dirs):
-                continue
-            if txt_file.name in excluded_files:
-                continue
-            if any(pattern in txt_file.name for pattern in excluded_patterns):
-                continue
-            
-            if txt_file.name in ['README.txt', 'LICENSE.txt'] or 'README' in txt_file.name:
-                chunks = self.extract_markdown_info(txt_file)
-                all_chunks.extend(chunks)
-                if chunks:
-                    print(f"  Indexed: {txt_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+        self.openai_client = OpenAI(api_key=api_key)
+        self.encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_dim = 1536  # text-embedding-3-small dimension
         
-        for html_file in html_files:
-            if any(excluded in str(html_file) for excluded in excluded_dirs):
-                continue
-            if html_file.name in excluded_files:
-                continue
-            if any(pattern in html_file.name for pattern in excluded_patterns):
-                continue
-            
-            chunks = self.extract_code_info(html_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {html_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+        # Per-file and per-chunk content hashes of the last build, for incremental updates
+        self.manifest_file = self.db_path / 'manifest.json'
+        self.embedding_cache = get_embedding_cache()
+        self.batcher = EmbeddingBatcher(self.openai_client, self.embedding_model)
         
-        for js_file in js_files:
-            if any(excluded in str(js_file) for excluded in excluded_dirs):
-                continue
-            if js_file.name in excluded_files:
-                continue
-            if any(pattern in js_file.name for pattern in excluded_patterns):
-                continue
-            
-            chunks = self.extract_code_info(js_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {js_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+        # FAISS index (will be created during indexing)
+        self.index = None
+        self.metadata = []
+    
+    def source_files(self) -> List[Tuple[Path, str]]:
+        """
+        (file, extractor method name) for every file to index, in walk order.
+
+        One directory walk; excluded directories are pruned without being
+        descended into.
+        """
+        files = []
+        counts = Counter()
+        
+        for root, dirs, names in os.walk(self.repo_path):
+            rel_root = Path(root).relative_to(self.repo_path)
+            dirs[:] = sorted(d for d in dirs if not is_excluded_dir((rel_root / d).as_posix()))
+            
+            for name in sorted(names):
+                suffix = Path(name).suffix
+                method = EXTRACTORS.get(suffix)
+                if method is None or name in EXCLUDED_FILES:
+                    continue
+                if any(pattern in name for pattern in EXCLUDED_PATTERNS):
+                    continue
+                if suffix == '.txt' and not (name in ['README.txt', 'LICENSE.txt'] or 'README' in name):
+                    continue
+                counts[suffix] += 1
+                files.append((Path(root) / name, method))
         
-        for css_file in css_files:
-            if any(excluded in str(css_file) for excluded in excluded_dirs):
-                continue
-            if css_file.name in excluded_files:
-                continue
-            if any(pattern in css_file.name for pattern in excluded_patterns):
+        print(f"Found {counts['.py']} Python files, {counts['.md']} Markdown files, {counts['.txt']} text files")
+        print(f"Found {counts['.html']} HTML files, {counts['.js']} JavaScript files, {counts['.css']} CSS files, {counts['.json']} JSON files")
+        return files
+    
+    def extract_files(self, jobs: List[Tuple[Path, str]]) -> List[List[Dict]]:
+        """Run the extractors for jobs, in worker processes when there are enough of them; results keep job order."""
+        if INDEX_WORKERS > 1 and len(jobs) >= PARALLEL_MIN_FILES:
+            try:
+                with ProcessPoolExecutor(max_workers=INDEX_WORKERS) as pool:
+                    return list(pool.map(_extract_file, [(self.repo_path, f, m) for f, m in jobs], chunksize=8))
+            except (OSError, BrokenProcessPool) as e:
+                print(f"Warning: Parallel extraction unavailable ({e}), extracting serially")
+        return [getattr(self, method)(file_path) for file_path, method in jobs]
+    
+    def load_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if (manifest.get('version') != MANIFEST_VERSION
+                or manifest.get('model') != self.embedding_model
+                or manifest.get('dim') != self.embedding_dim):
+            return None
+        return manifest
+    
+    def _load_previous(self):
+        """
+        Manifest, index, chunks (by FAISS id) and index config of the last
+        build, or None if there is none or it cannot be updated in place (e.g.
+        built before the manifest existed, or with another embedding model).
+        An index or chunk store that no longer matches the manifest, e.g.
+        rewritten by another tool, also forces a full build.
+        """
+        manifest = self.load_manifest()
+        index_file = self.db_path / 'index.faiss'
+        if manifest is None or not index_file.exists():
+            return None
+        
+        index = faiss.read_index(str(index_file))
+        if not isinstance(index, faiss.IndexIDMap):
+            return None
+        
+        store = open_chunk_store(self.db_path)
+        if store is None:
+            return None
+        docs = {doc['faiss_id']: doc for doc in store.iter_docs()}
+        if index.ntotal != manifest.get('ntotal') or chunks_digest(docs.values()) != manifest.get('chunks'):
+            print("Warning: Index or chunk store does not match the manifest, rebuilding from scratch")
+            return None
+        return manifest, index, docs, load_index_config(self.db_path, index)
+    
+    def index_repository(self, incremental: bool = True):
+        """
+        Build or update the index.
+        
+        With incremental, files whose content hash is unchanged reuse their
+        chunks, changed files are re-chunked and only chunks with new text are
+        embedded; chunks that disappeared are removed from the index by id.
+        
+        The index type follows the corpus size (see vector_index). When it
+        changes, or the index cannot be updated in place, it is rebuilt from
+        its stored vectors, or from re-embedded (usually cached) texts when
+        the old type only kept compressed vectors.
+        """
+        previous = self._load_previous() if incremental else None
+        if previous is not None:
+            manifest, self.index, old_docs, old_config = previous
+            old_files = manifest['files']
+            next_id = manifest['next_id']
+            print(f"Updating existing index ({self.index.ntotal} vectors)")
+        else:
+            self.index = None
+            old_docs, old_files, next_id, old_config = {}, {}, 0, None
+        
+        docs = []
+        pending = []
+        pending_tokens = []
+        doc_files = {}
+        files_manifest = {}
+        
+        # Hash every file first, then extract the changed ones in one parallel pass
+        scanned = []
+        jobs = []
+        for file_path, method in self.source_files():
+            try:
+                file_hash = hashlib.sha256(file_path.read_bytes()).hexdigest()
+            except OSError:
                 continue
             
-            chunks = self.extract_code_info(css_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {css_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+            rel = str(file_path.relative_to(self.repo_path))
+            old = old_files.get(rel)
+            unchanged = old and old['hash'] == file_hash and all(c['id'] in old_docs for c in old['chunks'])
+            scanned.append((file_path, rel, file_hash, old, None if unchanged else len(jobs)))
+            if not unchanged:
+                jobs.append((file_path, method))
         
-        for json_file in json_files:
-            if any(excluded in str(json_file) for excluded in excluded_dirs):
-                continue
-            if json_file.name in excluded_files:
-                continue
-            if any(pattern in json_file.name for pattern in excluded_patterns):
-                continue
+        extracted = self.extract_files(jobs)
+        
+        for file_path, rel, file_hash, old, job in scanned:
+            if job is None:
+                file_docs = [old_docs[c['id']] for c in old['chunks']]
+            else:
+                chunks = extracted[job]
+                if chunks:
+                    print(f"  Indexed: {file_path.relative_to(self.repo_path)} ({len(chunks)} chunks)")
+                
+                # Chunks whose text is unchanged keep their id and vector
+                reusable = {(c['doc_id'], c['hash']): c['id'] for c in old['chunks']} if old else {}
+                file_docs = []
+                for chunk in chunks:
+                    doc_id = f"{chunk['file']}:{chunk['type']}:{chunk['name']}"
+                    text_hash = content_hash(chunk['text'])
+                    faiss_id = reusable.pop((doc_id, text_hash), None)
+                    
+                    if faiss_id is None or faiss_id not in old_docs:
+                        faiss_id = next_id
+                        next_id += 1
+                        doc = {'id': doc_id, 'text': chunk['text'], 'metadata': {'file': chunk['file'], 'type': chunk['type'], 'name': chunk['name']}, 'faiss_id': faiss_id,
+                               'tokens': chunk['tokens'], 'preview': chunk['preview'], 'preview_tokens': chunk['preview_tokens']}
+                        pending.append(doc)
+                        pending_tokens.append(chunk['tokens'])
+                    else:
+                        doc = old_docs[faiss_id]
+                    file_docs.append(doc)
             
-            chunks = self.extract_code_info(json_file)
-            all_chunks.extend(chunks)
-            if chunks:
-                print(f"  Indexed: {json_file.relative_to(self.repo_path)} ({len(chunks)} chunks)")
-        
-        if not all_chunks:
-            return
-        
-        ids = [f"{chunk['file']}:{chunk['type']}:{chunk['name']}" for chunk in all_chunks]
-        texts = [chunk['text'] for chunk in all_chunks]
-        metadatas = [
-            {
-                'file': chunk['file'],
-                'type': chunk['type'],
-                'name': chunk['name']
-            }
-            for chunk in all_chunks
-        ]
-        
-        print("Generating embeddings...")
-        embeddings = []
-        ids_filtered = []
-        texts_filtered = []
-        metadatas_filtered = []
-        
-        max_tokens = 8000
-        for i, text in enumerate(texts):
-            tokens = len(self.encoding.encode(text))
-            if tokens > max_tokens:
-                print(f"  Warning: Skipping chunk {ids[i]} (too large: {tokens} tokens)")
-                continue
-            ids_filtered.append(ids[i])
-            texts_filtered.append(text)
-            metadatas_filtered.append(metadatas[i])
+            for doc in file_docs:
+                doc_files[doc['faiss_id']] = rel
+            
+            if file_docs:
+                docs.extend(file_docs)
+                files_manifest[rel] = {
+                    'hash': file_hash,
+                    'chunks': [{'id': d['faiss_id'], 'doc_id': d['id'], 'hash': content_hash(d['text'])} for d in file_docs],
+                }
         
-        if not texts_filtered:
-            print("No valid chunks after filtering")
+        if not docs:
+            print("No valid chunks to index")
             return 0
         
-        print(f"Filtered {len(texts) - len(texts_filtered)} chunks that were too large")
-        print(f"Processing {len(texts_filtered)} chunks...")
-        
-        batch_size = 50
-        for i in range(0, len(texts_filtered), batch_size):
-            batch = texts_filtered[i:i+batch_size]
-            try:
-                response = self.openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=batch
+        kept_ids = {doc['faiss_id'] for doc in docs}
+        removed_ids = [faiss_id for faiss_id in old_docs if faiss_id not in kept_ids]
+        print(f"{len(docs) - len(pending)} chunks unchanged, {len(pending)} to embed, {len(removed_ids)} to remove")
+        
+        config = choose_index_config(len(docs), self.embedding_dim)
+        rebuild = old_config is None or needs_rebuild(old_config, config, bool(removed_ids))
+        reused, reused_vectors = [], None
+        if not rebuild:
+            config = old_config
+        elif previous is not None:
+            pending_ids = {doc['faiss_id'] for doc in pending}
+            reused = [doc for doc in docs if doc['faiss_id'] not in pending_ids]
+            reused_vectors = reconstruct_vectors(self.index, old_config, [doc['faiss_id'] for doc in reused])
+            if reused_vectors is None:
+                print(f"Re-embedding {len(reused)} chunks to rebuild the {old_config['type']} index as {config['type']}")
+                pending.extend(reused)
+                pending_tokens.extend(doc.get('tokens') or count_tokens(doc['text']) for doc in reused)
+                reused = []
+        
+        if not rebuild and not pending and not removed_ids and files_manifest == old_files:
+            print("Index is up to date")
+            return len(docs)
+        
+        added = []
+        if pending:
+            print("Generating embeddings...")
+            embeddings = self._embed_texts([doc['text'] for doc in pending], [doc['id'] for doc in pending], pending_tokens)
+            
+            # Chunks without an embedding are left out, never indexed as zero vectors.
+            # Their files get no hash, so the next run re-chunks them and retries.
+            failed = {doc['faiss_id'] for doc, vector in zip(pending, embeddings) if vector is None}
+            if failed:
+                print(f"Warning: {len(failed)} chunks could not be embedded and were not indexed")
+                docs = [doc for doc in docs if doc['faiss_id'] not in failed]
+                for faiss_id in failed:
+                    entry = files_manifest[doc_files[faiss_id]]
+                    entry['hash'] = None
+                    entry['chunks'] = [c for c in entry['chunks'] if c['id'] != faiss_id]
+            
+            added = [(doc['faiss_id'], vector) for doc, vector in zip(pending, embeddings) if vector is not None]
+        
+        if rebuild:
+            ids = [doc['faiss_id'] for doc in reused] + [faiss_id for faiss_id, _ in added]
+            vectors = [vector for _, vector in added]
+            if reused_vectors is not None:
+                vectors = list(reused_vectors) + vectors
+            print(f"Building {config['type']} index ({config['metric']}) over {len(ids)} vectors")
+            self.index = build_index(
+                config, prepare_vectors(vectors, config['metric']).reshape(-1, self.embedding_dim), np.array(ids, dtype='int64')
+            )
+        else:
+            if added:
+                self.index.add_with_ids(
+                    prepare_vectors([vector for _, vector in added], config['metric']),
+                    np.array([faiss_id for faiss_id, _ in added], dtype='int64')
                 )
-                batch_embeddings = [item.embedding for item in response.data]
-                embeddings.extend(batch_embeddings)
-                print(f"Processed {min(i+batch_size, len(texts_filtered))}/{len(texts_filtered)} chunks")
-            except Exception as e:
-                print(f"Error processing batch {i//batch_size + 1}: {e}")
-                if "maximum context length" in str(e).lower():
-                    print("  Trying smaller batch size...")
-                    for j in range(i, min(i+batch_size, len(texts_filtered))):
-                        try:
-                            single_response = self.openai_client.embeddings.create(
-                                model="text-embedding-3-small",
-                                input=[texts_filtered[j]]
-                            )
-                            embeddings.append(single_response.data[0].embedding)
-                            print(f"  Processed single chunk {j+1}/{len(texts_filtered)}")
-                        except Exception as e2:
-                            print(f"  Skipping chunk {ids_filtered[j]} due to error: {e2}")
-                            embeddings.append([0.0] * 1536)
-                else:
-                    raise
-        
-        # Create FAISS index
-        if len(embeddings) != len(ids_filtered):
-            print(f"Warning: Embedding count ({len(embeddings)}) doesn't match filtered IDs ({len(ids_filtered)})")
-            min_len = min(len(embeddings), len(ids_filtered), len(texts_filtered), len(metadatas_filtered))
-            embeddings = embeddings[:min_len]
-            ids_filtered = ids_filtered[:min_len]
-            texts_filtered = texts_filtered[:min_len]
-            metadatas_filtered = metadatas_filtered[:min_len]
-        
-        # Convert embeddings to numpy array
-        embeddings_array = np.array(embeddings, dtype='float32')
-        
-        # Create FAISS index
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
-        self.index.add(embeddings_array)
-        
-        # Save FAISS index
+            if removed_ids:
+                self.index.remove_ids(np.array(removed_ids, dtype='int64'))
+        
+        self._write_index(docs, config, {
+            'version': MANIFEST_VERSION,
+            'model': self.embedding_model,
+            'dim': self.embedding_dim,
+            'next_id': next_id,
+            'ntotal': self.index.ntotal,
+            'chunks': chunks_digest(docs),
+            'files': files_manifest,
+        })
+        return len(docs)
+    
+    def _embed_texts(self, texts: List[str], ids: List[str], token_counts: List[int]) -> List[Optional[List[float]]]:
+        """
+        Embeddings for texts in order, from the embedding cache where possible.
+        Texts that could not be embedded are None.
+        """
+        cache = self.embedding_cache
+        embeddings = cache.get_many(texts, self.embedding_model, self.embedding_dim) if cache is not None else [None] * len(texts)
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        if len(missing) < len(texts):
+            print(f"{len(texts) - len(missing)} embeddings taken from cache")
+        if not missing:
+            return embeddings
+        
+        def store(batch, vectors):
+            # Cached as batches finish, so an interrupted build resumes where it stopped
+            done = [(missing[i], vector) for i, vector in zip(batch, vectors) if vector is not None]
+            if cache is not None and done:
+                cache.put_many([texts[i] for i, _ in done], [v for _, v in done], self.embedding_model, self.embedding_dim)
+        
+        fresh = self.batcher.embed(
+            [texts[i] for i in missing],
+            [token_counts[i] for i in missing],
+            labels=[ids[i] for i in missing],
+            on_batch=store,
+        )
+        for i, vector in zip(missing, fresh):
+            embeddings[i] = vector
+        return embeddings
+    
+    def _write_index(self, docs: List[Dict], config: Dict, manifest: Dict):
+        """Write index, config, chunk store and manifest; the manifest goes last so a crash forces a full check next time."""
         index_file = self.db_path / 'index.faiss'
-        faiss.write_index(self.index, str(index_file))
-        
-        # Save metadata
-        metadata_data = []
-        for i, (doc_id, text, metadata) in enumerate(zip(ids_filtered, texts_filtered, metadatas_filtered)):
-            metadata_data.append({
-                'id': doc_id,
-                'text': text,
-                'metadata': metadata
-            })
-        
-        metadata_file = self.db_path / 'metadata.json'
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata_data, f)
-        
-        return len(ids_filtered)
+        faiss.write_index(self.index, str(index_file) + '.tmp')
+        os.replace(str(index_file) + '.tmp', index_file)
+        write_index_config(self.db_path, config)
+        
+        # Rows from stores written before token counts were kept get them now
+        for doc in docs:
+            if doc.get('tokens') is None:
+                doc.update(token_preview(doc['text']))
+        write_chunk_store(self.db_path / STORE_FILENAME, docs)
+        # The chunk store replaces metadata.json; a stale copy would be migrated over it
+        legacy_metadata = self.db_path / LEGACY_METADATA_FILENAME
+        if legacy_metadata.exists():
+            legacy_metadata.unlink()
+        
+        with open(str(self.manifest_file) + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(str(self.manifest_file) + '.tmp', self.manifest_file)
     
-    def update_index(self, file_path: Path):
-        # For FAISS, we need to rebuild the entire index
-        # This is a limitation of FAISS - it doesn't support incremental updates easily
-        print("FAISS doesn't support incremental updates. Rebuilding full index...")
-        return self.index_repository()
-
+    def update_index(self, file_path: Path = None):
+        """Bring the index up to date; only changed files are re-chunked and re-embedded."""
+        return self.index_repository(incremental=True)
@@ -4,11 +4,13 @@ from pathlib import Path
 from typing import List, Dict, Optional
 import faiss
 import numpy as np
-import json
 from openai import OpenAI
 from dotenv import load_dotenv
 import tiktoken
 
+from chatbot.chunk_store import LEGACY_METADATA_FILENAME, STORE_FILENAME, write_chunk_store
+from chatbot.vector_index import build_index, choose_index_config, prepare_vectors, write_index_config
+
 load_dotenv()
 
 class CodeIndexer:
@@ -87,40 +89,44 @@ class CodeIndexer:
         texts = [chunk['text'] for chunk in all_chunks]
         ids = [f"{chunk['file']}:{chunk['type']}:{chunk['name']}" for chunk in all_chunks]
         metadatas = [{'file': chunk['file'], 'type': chunk['type'], 'name': chunk['name']} for chunk in all_chunks]
+        previews = [{key: chunk[key] for key in ('tokens', 'preview', 'preview_tokens')} for chunk in all_chunks]
         
         print("Generating embeddings...")
-        embeddings = []
-        batch_size = 50
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=batch
-            )
-            batch_embeddings = [item.embedding for item in response.data]
-            embeddings.extend(batch_embeddings)
-            print(f"Processed {min(i+batch_size, len(texts))}/{len(texts)} chunks")
-        
-        # Create FAISS index
-        embeddings_array = np.array(embeddings, dtype='float32')
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
-        self.index.add(embeddings_array)
+        # Same token-budgeted, cached embedding path as the original indexer
+        token_counts = [chunk['tokens'] for chunk in all_chunks]
+        embeddings = original._embed_texts(texts, ids, token_counts)
+        
+        embedded = [i for i, vector in enumerate(embeddings) if vector is not None]
+        if len(embedded) < len(texts):
+            print(f"Warning: {len(texts) - len(embedded)} chunks could not be embedded and were not indexed")
+        embeddings = [embeddings[i] for i in embedded]
+        texts = [texts[i] for i in embedded]
+        ids = [ids[i] for i in embedded]
+        metadatas = [metadatas[i] for i in embedded]
+        previews = [previews[i] for i in embedded]
+        
+        # Create FAISS index; type and metric follow the corpus size (see vector_index)
+        config = choose_index_config(len(embeddings), self.embedding_dim)
+        self.index = build_index(config, prepare_vectors(embeddings, config['metric']), np.arange(len(embeddings)))
+        
+        # Ids start over at 0, so the incremental indexer's manifest no longer describes them
+        manifest_file = self.db_path / 'manifest.json'
+        if manifest_file.exists():
+            manifest_file.unlink()
         
         # Save index
         index_file = self.db_path / 'index.faiss'
-        faiss.write_index(self.index, str(index_file))
-        
-        # Save metadata
-        metadata_data = []
-        for i, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
-            metadata_data.append({
-                'id': doc_id,
-                'text': text,
-                'metadata': metadata
-            })
-        
-        metadata_file = self.db_path / 'metadata.json'
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata_data, f)
+        faiss.write_index(self.index, str(index_file) + '.tmp')
+        os.replace(str(index_file) + '.tmp', index_file)
+        write_index_config(self.db_path, config)
+        
+        # Save chunks; the list position is the FAISS id
+        write_chunk_store(self.db_path / STORE_FILENAME, [
+            dict({'id': doc_id, 'text': text, 'metadata': metadata, 'faiss_id': i}, **preview)
+            for i, (doc_id, text, metadata, preview) in enumerate(zip(ids, texts, metadatas, previews))
+        ])
+        legacy_metadata = self.db_path / LEGACY_METADATA_FILENAME
+        if legacy_metadata.exists():
+            legacy_metadata.unlink()
         
         return len(ids)
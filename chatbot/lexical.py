@@ -0,0 +1,54 @@
+"""
+Lexical Search
+Code-aware tokenization and rank fusion for BM25 retrieval.
+
+Identifiers are indexed whole and split into their snake_case and
+camelCase parts, so process_grid_data is found by "process_grid_data",
+"grid data" and processGridData alike. The BM25 index itself is an FTS5
+table in the chunk store; results are fused with vector search by
+reciprocal rank fusion.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Reciprocal rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = 60
+MAX_QUERY_TERMS = 32
+
+TOKEN_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+CAMEL_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+# A bare symbol or file name: one token with an underscore, dot, slash or inner capital
+SYMBOL_QUERY = re.compile(r'[\w./-]*(?:_|\.|/|[a-z][A-Z])[\w./-]*')
+
+
+def code_terms(text: str) -> List[str]:
+    """Lowercased terms of text: each identifier, then its parts if it has several."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text):
+        terms.append(token.lower())
+        parts = [p.lower() for chunk in token.split('_') for p in CAMEL_PATTERN.findall(chunk)]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def match_query(query: str) -> Optional[str]:
+    """FTS5 query matching any term of query, or None if it has none."""
+    terms = list(dict.fromkeys(code_terms(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' OR '.join(f'"{term}"' for term in terms)
+
+
+def is_symbol_query(query: str) -> bool:
+    return SYMBOL_QUERY.fullmatch(query.strip().strip('`\'"?')) is not None
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Ids ranked by the sum of 1 / (k + rank) over the rankings they appear in."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
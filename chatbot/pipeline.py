@@ -0,0 +1,131 @@
+"""
+Retrieval Pipeline
+Runs the independent stages of a chat request side by side.
+
+A request needs a query embedding (an API call), the vector and BM25
+search, source links for the retrieved chunks and, when enabled, web
+search results (another HTTP call). Web search depends only on the
+question, so it starts together with the embedding and runs while the
+index is searched and sources are resolved. Each stage has its own
+timeout, measured from the start of the request: a slow embedding falls
+back to lexical search, a slow web search is dropped from the context.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Optional
+
+# Embedding, index search and source resolution together
+RETRIEVAL_TIMEOUT = float(os.getenv('CHATBOT_RETRIEVAL_TIMEOUT', '10'))
+WEB_SEARCH_TIMEOUT = float(os.getenv('CHATBOT_WEB_SEARCH_TIMEOUT', '3'))
+PIPELINE_WORKERS = int(os.getenv('CHATBOT_PIPELINE_WORKERS', '8'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for pipeline stages; threads do not survive a fork, so each process gets its own."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='chatbot-pipeline')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+class RetrievalPipeline:
+    def __init__(self, retriever, path_sanitizer, web_search=None,
+                 retrieval_timeout: float = RETRIEVAL_TIMEOUT, web_search_timeout: float = WEB_SEARCH_TIMEOUT):
+        """
+        Args:
+            retriever: CodeRetriever (or the FAISS variant)
+            path_sanitizer: PathSanitizer turning chunk metadata into source links
+            web_search: WebSearch, or None to answer from the codebase only
+        """
+        self.retriever = retriever
+        self.path_sanitizer = path_sanitizer
+        self.web_search = web_search
+        self.retrieval_timeout = retrieval_timeout
+        self.web_search_timeout = web_search_timeout
+
+    def start(self, question: str, client_ip: str = 'unknown') -> 'PendingRetrieval':
+        """Start embedding the question and, if enabled, searching the web for it."""
+        executor = get_executor()
+        web = executor.submit(self.web_search.search, question, client_ip) if self.web_search else None
+        embedding = executor.submit(self.retriever.try_embed_query, question)
+        return PendingRetrieval(self, question, embedding, web)
+
+
+class PendingRetrieval:
+    """Stages of one request in flight; see RetrievalPipeline.start."""
+
+    def __init__(self, pipeline: RetrievalPipeline, question: str, embedding: Future, web: Optional[Future]):
+        self.pipeline = pipeline
+        self.question = question
+        self.started = time.monotonic()
+        self._embedding = embedding
+        self._web = web
+
+    def _remaining(self, timeout: float) -> float:
+        return max(0.0, timeout - (time.monotonic() - self.started))
+
+    def query_embedding(self):
+        """
+        The question's embedding, or None where lexical search answers alone
+        (see CodeRetriever.try_embed_query). An embedding that misses the
+        retrieval timeout counts as unavailable when lexical search can
+        stand in, and raises TimeoutError otherwise.
+        """
+        try:
+            return self._embedding.result(timeout=self._remaining(self.pipeline.retrieval_timeout))
+        except TimeoutError:
+            if not getattr(self.pipeline.retriever, 'lexical', False):
+                raise
+            print(f"WARNING: Query embedding timed out after {self.pipeline.retrieval_timeout}s, using lexical search",
+                  file=sys.stderr)
+            return None
+
+    def cancel(self):
+        """Drop the request, e.g. when it was answered from the cache; running stages finish unobserved."""
+        self._embedding.cancel()
+        if self._web is not None:
+            self._web.cancel()
+
+    def _retrieve(self, query_embedding, n_results: int) -> Dict:
+        retrieved = self.pipeline.retriever.retrieve(self.question, n_results=n_results, query_embedding=query_embedding)
+        # Only return valid, existing file paths
+        sources = self.pipeline.path_sanitizer.sanitize_sources([item['metadata'] for item in retrieved])
+        return {'retrieved': retrieved, 'sources': sources}
+
+    def finish(self, query_embedding, n_results: int = 3) -> Dict:
+        """
+        Search the index and resolve sources while the web search completes.
+
+        Returns {'retrieved', 'sources', 'web'}; 'web' is the WebSearch
+        result, or None when web search is off, failed or timed out.
+        Retrieval errors are raised, retrieval timeouts as TimeoutError.
+        """
+        retrieval = get_executor().submit(self._retrieve, query_embedding, n_results)
+        result = retrieval.result(timeout=self._remaining(self.pipeline.retrieval_timeout))
+
+        result['web'] = None
+        if self._web is not None:
+            try:
+                web = self._web.result(timeout=self._remaining(self.pipeline.web_search_timeout))
+            except TimeoutError:
+                print(f"WARNING: Web search timed out after {self.pipeline.web_search_timeout}s, answering without it",
+                      file=sys.stderr)
+            except Exception as e:
+                # e.g. the shared rate limit store failing; web context is optional
+                print(f"WARNING: Web search failed ({e}), answering without it", file=sys.stderr)
+            else:
+                if web.get('results'):
+                    result['web'] = web
+        return result
+
@@ -0,0 +1,191 @@
+"""
+Prompt Builder
+Token-exact assembly of the chat prompt.
+
+Every part of the prompt is counted in tokens rather than characters.
+Retrieved chunks come with their token count and a preview of their
+first CHUNK_CONTEXT_TOKENS tokens from the index (see chunker), so they
+are budgeted without tokenizing; chunks from older indexes are tokenized
+once and their token arrays kept in an LRU keyed by index version and
+chunk id. Chunks are packed greedily in rank order into the context
+budget and cut on token boundaries. The budget left for context is what
+the system prompt, history and question leave of the prompt limit, so
+the prompt size is known before the request is sent. Part counts only
+plan the packing; the assembled context and user message are counted
+once more as a whole, since tokens can merge across part boundaries.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .chunker import PREVIEW_TOKENS
+
+MAX_CONTEXT_TOKENS = int(os.getenv('CHATBOT_MAX_CONTEXT_TOKENS', '2000'))
+MAX_PROMPT_TOKENS = int(os.getenv('CHATBOT_MAX_PROMPT_TOKENS', '4000'))
+# Per retrieved chunk (about 300 characters); the indexer stores previews of this size
+CHUNK_CONTEXT_TOKENS = PREVIEW_TOKENS
+HISTORY_MESSAGE_TOKENS = 100
+# A chunk is cut no shorter than this; with less room it is skipped
+MIN_CHUNK_CONTEXT_TOKENS = 16
+CHUNK_TOKEN_CACHE_SIZE = int(os.getenv('CHATBOT_CHUNK_TOKEN_CACHE_SIZE', '2048'))
+
+# Chat format overhead: every message adds 3 tokens plus its role, the reply is primed with 3
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+CONTEXT_HEADER = "Context from codebase:\n"
+QUESTION_TEMPLATE = "\n\nQuestion: {question}\n\nProvide a concise, direct answer (2-4 sentences max):"
+
+
+class ChunkTokenCache:
+    """LRU of chunk key -> (token prefix, token count), and file path -> header token count."""
+
+    def __init__(self, max_entries: int = CHUNK_TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, object]' = OrderedDict()
+
+    def get(self, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class PromptBuilder:
+    def __init__(self, encoding, system_prompt: str, max_context_tokens: int = MAX_CONTEXT_TOKENS,
+                 max_prompt_tokens: int = MAX_PROMPT_TOKENS, chunk_context_tokens: int = CHUNK_CONTEXT_TOKENS,
+                 cache: ChunkTokenCache = None):
+        self.encoding = encoding
+        self.system_prompt = system_prompt
+        self.max_context_tokens = max_context_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.chunk_context_tokens = chunk_context_tokens
+        self.cache = cache or ChunkTokenCache()
+
+        # Fixed pieces are tokenized once
+        self.system_tokens = len(encoding.encode(system_prompt))
+        self.header_tokens = len(encoding.encode(CONTEXT_HEADER))
+        self.newline_tokens = len(encoding.encode("\n"))
+        self.separator_tokens = len(encoding.encode("\n---"))
+        self.ellipsis_tokens = len(encoding.encode("..."))
+
+    def file_header(self, item: Dict) -> Tuple[str, int]:
+        """A chunk's 'File: ...' line and its token count; counts are cached per path."""
+        header = f"File: {item['metadata'].get('file', 'unknown')}\n"
+        count = self.cache.get(('file', header))
+        if count is None:
+            count = len(self.encoding.encode(header))
+            self.cache.put(('file', header), count)
+        return header, count
+
+    def chunk_tokens(self, item: Dict, version: str = None) -> Tuple[List[int], int]:
+        """First chunk_context_tokens tokens of a chunk's text and the text's full token count."""
+        key = (version, item.get('faiss_id', item.get('id')), self.chunk_context_tokens)
+        entry = self.cache.get(key)
+        if entry is None:
+            tokens = self.encoding.encode(item['text'])
+            entry = (tokens[:self.chunk_context_tokens], len(tokens))
+            self.cache.put(key, entry)
+        return entry
+
+    def chunk_preview(self, item: Dict, version: str = None) -> Tuple[str, int, int]:
+        """
+        (text, token count, full token count) of the start of a chunk's text,
+        from the preview stored at index time when it has the size in use.
+        """
+        total, preview = item.get('tokens'), item.get('preview')
+        if total is not None and preview is not None and item.get('preview_tokens') == min(total, self.chunk_context_tokens):
+            return preview, item['preview_tokens'], total
+        tokens, total = self.chunk_tokens(item, version)
+        return self.encoding.decode(tokens), len(tokens), total
+
+    def pack_context(self, retrieved: List[Dict], budget: int, version: str = None, extra: str = None) -> Tuple[str, int]:
+        """
+        Context text and its token count: the retrieved chunks in rank order,
+        each as 'File: path\\ntext\\n---', cut to fit budget; extra (web
+        results) fills what is left. The count is of the joined text, which
+        is cut on a token boundary in the rare case it exceeds budget.
+        """
+        parts: List[str] = []
+        used = 0
+        for item in retrieved:
+            header, header_tokens = self.file_header(item)
+            body, body_tokens, body_total = self.chunk_preview(item, version)
+            room = budget - used - header_tokens - self.separator_tokens - (self.newline_tokens if parts else 0)
+            truncated = body_total > body_tokens or body_tokens > room
+            if truncated:
+                room -= self.ellipsis_tokens
+                if room < MIN_CHUNK_CONTEXT_TOKENS:
+                    # Too little room for a useful cut; a later, shorter chunk may still fit whole
+                    continue
+                if body_tokens > room:
+                    # Only cuts below the preview size need the tokenizer
+                    body, body_tokens = self.encoding.decode(self.chunk_tokens(item, version)[0][:room]), room
+            used += (self.newline_tokens if parts else 0) + header_tokens + body_tokens + self.separator_tokens
+            if truncated:
+                used += self.ellipsis_tokens
+            parts.append(f"{header}{body}{'...' if truncated else ''}\n---")
+
+        context = "\n".join(parts)
+        if extra:
+            # Only whole tokens of extra that still fit
+            room = budget - used - self.newline_tokens
+            if room >= MIN_CHUNK_CONTEXT_TOKENS:
+                tokens = self.encoding.encode(extra)[:room]
+                context += "\n" + self.encoding.decode(tokens)
+
+        tokens = self.encoding.encode(context)
+        if len(tokens) > budget:
+            tokens = tokens[:budget]
+            context = self.encoding.decode(tokens)
+        return context, len(tokens)
+
+    def build(self, question: str, retrieved: List[Dict], conversation_history: List[Dict] = None,
+              version: str = None, extra: str = None) -> Dict:
+        """
+        Chat messages for question.
+
+        Returns {'messages', 'prompt_tokens', 'context_tokens'}; prompt_tokens
+        counts the chat format overhead as well, as the API bills it.
+        """
+        messages = [{"role": "system", "content": self.system_prompt}]
+        prompt_tokens = self.system_tokens + MESSAGE_OVERHEAD_TOKENS + REPLY_PRIMING_TOKENS
+
+        if conversation_history:
+            for msg in conversation_history[-1:]:  # Only last 1 message
+                content = msg.get('content', '')
+                tokens = self.encoding.encode(content)
+                # Keep history context short, cut on a token boundary
+                count = len(tokens)
+                if count > HISTORY_MESSAGE_TOKENS:
+                    content = self.encoding.decode(tokens[:HISTORY_MESSAGE_TOKENS]) + "..."
+                    count = HISTORY_MESSAGE_TOKENS + self.ellipsis_tokens
+                messages.append({"role": msg.get('role', 'user'), "content": content})
+                prompt_tokens += count + MESSAGE_OVERHEAD_TOKENS
+
+        question_block = QUESTION_TEMPLATE.format(question=question)
+        question_tokens = self.header_tokens + len(self.encoding.encode(question_block))
+
+        # Context gets what the rest of the prompt leaves, up to its own budget
+        budget = max(0, min(self.max_context_tokens,
+                            self.max_prompt_tokens - prompt_tokens - question_tokens - MESSAGE_OVERHEAD_TOKENS))
+        context, context_tokens = self.pack_context(retrieved, budget, version, extra)
+
+        content = CONTEXT_HEADER + context + question_block
+        prompt_tokens += len(self.encoding.encode(content)) + MESSAGE_OVERHEAD_TOKENS
+        messages.append({"role": "user", "content": content})
+
+        return {'messages': messages, 'prompt_tokens': prompt_tokens, 'context_tokens': context_tokens}
@@ -0,0 +1,251 @@
+"""
+Rate Limit Store
+Shared counters for chatbot rate limits, IP blocks and cost accounting.
+
+Limits use a sliding-window counter: each (key, window) keeps the hit count of
+the current and the previous aligned window, and the estimate is
+previous * (remaining fraction of window) + current. A check is O(1) no matter
+how many requests a client has made.
+
+Backends:
+    memory - per-process dicts, guarded by a lock
+    sqlite - one database file shared by every worker on the host
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Limits are (max_hits, window_seconds) pairs
+Limits = List[Tuple[int, int]]
+
+BLOCK_SECONDS = int(os.getenv('CHATBOT_BLOCK_SECONDS', '86400'))
+
+
+def _slide(state: Optional[Tuple[int, int, int]], window: int, now: float) -> Tuple[int, int, int, float]:
+    """
+    Advance a (start, count, prev) window state to `now`.
+
+    Returns (start, count, prev, estimate) for the current aligned window.
+    """
+    current_start = int(now // window) * window
+    if state is None:
+        count, prev = 0, 0
+    else:
+        start, count, prev = state
+        if start == current_start:
+            pass
+        elif start == current_start - window:
+            count, prev = 0, count
+        else:
+            count, prev = 0, 0
+
+    weight = 1.0 - (now - current_start) / window
+    return current_start, count, prev, prev * weight + count
+
+
+def _check(states: List[Optional[Tuple[int, int, int]]], limits: Limits, now: float):
+    """
+    Evaluate all limits for one key.
+
+    Returns (violated_index, new_states). The hit is only recorded in
+    new_states when no limit is violated.
+    """
+    advanced = []
+    for i, (state, (max_hits, window)) in enumerate(zip(states, limits)):
+        start, count, prev, estimate = _slide(state, window, now)
+        if estimate >= max_hits:
+            return i, None
+        advanced.append((start, count + 1, prev))
+    return None, advanced
+
+
+class MemoryRateLimitStore:
+    """In-process store. Counters are shared between threads, not workers."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, int], Tuple[int, int, int]] = {}
+        self._blocked: Dict[str, float] = {}
+        self._costs: Dict[str, float] = {}
+        self._hits = 0
+
+    def hit(self, key: str, limits: Limits, now: float = None) -> Optional[int]:
+        """Record a hit for key. Returns the index of the violated limit, or None."""
+        now = time.time() if now is None else now
+        with self._lock:
+            states = [self._windows.get((key, window)) for _, window in limits]
+            violated, new_states = _check(states, limits, now)
+            if violated is not None:
+                return violated
+            for (_, window), state in zip(limits, new_states):
+                self._windows[(key, window)] = state
+
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+            return None
+
+    def _sweep(self, now: float):
+        stale = [k for k, (start, _, _) in self._windows.items() if start < now - 2 * k[1]]
+        for k in stale:
+            del self._windows[k]
+        for key in [k for k, until in self._blocked.items() if until <= now]:
+            del self._blocked[key]
+
+    def is_blocked(self, key: str, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        until = self._blocked.get(key)
+        return until is not None and until > now
+
+    def block(self, key: str, seconds: int = BLOCK_SECONDS):
+        with self._lock:
+            self._blocked[key] = time.time() + seconds
+
+    def add_cost(self, bucket: str, amount: float) -> float:
+        """Add amount to a cost bucket (e.g. a date) and return the new total."""
+        with self._lock:
+            self._costs[bucket] = self._costs.get(bucket, 0.0) + amount
+            return self._costs[bucket]
+
+    def get_cost(self, bucket: str) -> float:
+        return self._costs.get(bucket, 0.0)
+
+
+class SQLiteRateLimitStore:
+    """
+    SQLite-backed store shared by all workers that open the same file.
+
+    Each check runs in one IMMEDIATE transaction, so concurrent workers
+    serialize on the write lock and never double-count a window.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self._local = threading.local()
+        self._hits = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_windows ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, start INTEGER NOT NULL, '
+                'count INTEGER NOT NULL, prev INTEGER NOT NULL, PRIMARY KEY (key, window))'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS blocked (key TEXT PRIMARY KEY, until REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS costs (bucket TEXT PRIMARY KEY, amount REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_file), timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key: str, limits: Limits, now: float = None) -> Optional[int]:
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = dict(
+                (window, (start, count, prev))
+                for window, start, count, prev in conn.execute(
+                    'SELECT window, start, count, prev FROM rate_windows WHERE key = ?', (key,)
+                )
+            )
+            states = [rows.get(window) for _, window in limits]
+            violated, new_states = _check(states, limits, now)
+            if violated is None:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rate_windows (key, window, start, count, prev) VALUES (?, ?, ?, ?, ?)',
+                    [(key, window) + state for (_, window), state in zip(limits, new_states)]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        # Counted per process; every worker sweeps now and then
+        self._hits += 1
+        if self._hits % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+        return violated
+
+    def _sweep(self, now: float):
+        conn = self._connect()
+        conn.execute('DELETE FROM rate_windows WHERE start < ? - 2 * window', (now,))
+        conn.execute('DELETE FROM blocked WHERE until <= ?', (now,))
+
+    def is_blocked(self, key: str, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        row = self._connect().execute('SELECT until FROM blocked WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] > now
+
+    def block(self, key: str, seconds: int = BLOCK_SECONDS):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO blocked (key, until) VALUES (?, ?)', (key, time.time() + seconds)
+        )
+
+    def add_cost(self, bucket: str, amount: float) -> float:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO costs (bucket, amount) VALUES (?, ?) '
+                'ON CONFLICT(bucket) DO UPDATE SET amount = amount + excluded.amount',
+                (bucket, amount)
+            )
+            total = conn.execute('SELECT amount FROM costs WHERE bucket = ?', (bucket,)).fetchone()[0]
+            conn.execute('COMMIT')
+            return total
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_cost(self, bucket: str) -> float:
+        row = self._connect().execute('SELECT amount FROM costs WHERE bucket = ?', (bucket,)).fetchone()
+        return row[0] if row else 0.0
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def create_store(backend: str = None, db_file: Path = None):
+    """
+    Build a store from arguments or the environment.
+
+    CHATBOT_RATE_LIMIT_BACKEND: 'sqlite' (default) or 'memory'
+    CHATBOT_RATE_LIMIT_DB: SQLite file, defaults to the system temp dir
+    (writable on serverless as well)
+    """
+    backend = (backend or os.getenv('CHATBOT_RATE_LIMIT_BACKEND', 'sqlite')).lower()
+    if backend == 'memory':
+        return MemoryRateLimitStore()
+
+    db_file = db_file or os.getenv('CHATBOT_RATE_LIMIT_DB') or (Path(tempfile.gettempdir()) / 'neuraxon_chatbot_limits.sqlite3')
+    try:
+        return SQLiteRateLimitStore(db_file)
+    except sqlite3.Error as e:
+        print(f"WARNING: Rate limit database unavailable ({e}), using in-process limits", file=sys.stderr)
+        return MemoryRateLimitStore()
+
+
+def get_default_store():
+    """Return the process-wide store shared by every ChatbotSecurity instance."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = create_store()
+    return _default_store
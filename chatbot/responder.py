@@ -1,15 +1,25 @@
 import os
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from openai import OpenAI
 from dotenv import load_dotenv
+from .answer_cache import get_answer_cache
 from .retriever import CodeRetriever
 from .security import ChatbotSecurity
 from .path_sanitizer import PathSanitizer
+from .pipeline import RetrievalPipeline
+from .prompt_builder import PromptBuilder
+from .web_search import WebSearch
 import tiktoken
 
 load_dotenv()
 
+# Completion cap; with the prompt size it bounds a request's cost before it is sent
+MAX_ANSWER_TOKENS = 500
+
+# Add DuckDuckGo results to the codebase context; searched alongside retrieval
+WEB_SEARCH_ENABLED = os.getenv('CHATBOT_WEB_SEARCH', 'false').lower() == 'true'
+
 class ChatbotResponder:
     def __init__(self, retriever: CodeRetriever, repo_root: Path = None):
         api_key = os.getenv('OPENAI_API_KEY')
@@ -19,13 +29,15 @@ class ChatbotResponder:
         self.client = OpenAI(api_key=api_key)
         self.retriever = retriever
         self.security = ChatbotSecurity()
-        self.web_search = None
+        self.web_search = WebSearch() if WEB_SEARCH_ENABLED else None
         self.encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        self.answer_cache = get_answer_cache()
         
         # Initialize path sanitizer
         if repo_root is None:
             repo_root = Path(__file__).parent.parent.parent
         self.path_sanitizer = PathSanitizer(repo_root)
+        self.pipeline = RetrievalPipeline(retriever, self.path_sanitizer, self.web_search)
         
         self.system_prompt = """You are a technical assistant for the Anna Matrix Lab repository. Provide concise, accurate answers based on the codebase context.
 
@@ -38,6 +50,7 @@ Guidelines:
 - Always end with a complete sentence
 
 Be concise and direct - users want quick answers, not essays."""
+        self.prompt_builder = PromptBuilder(self.encoding, self.system_prompt)
 
     def estimate_tokens(self, text: str) -> int:
         return len(self.encoding.encode(text))
@@ -47,19 +60,14 @@ Be concise and direct - users want quick answers, not essays."""
         output_cost = (output_tokens / 1_000_000) * 0.60
         return input_cost + output_cost
     
-    def build_context(self, retrieved: List[Dict]) -> str:
-        context_parts = []
-        for item in retrieved:
-            file_path = item['metadata'].get('file', 'unknown')
-            text = item['text']
-            # Keep context per item short (up to 300 chars)
-            if len(text) > 300:
-                text = text[:300] + "..."
-            context_parts.append(f"File: {file_path}\n{text}\n---")
-        
-        return "\n".join(context_parts)
-    
-    def generate_response(self, question: str, conversation_history: List[Dict] = None, client_ip: str = 'unknown') -> Dict:
+    def prepare_request(self, question: str, conversation_history: List[Dict] = None, client_ip: str = 'unknown') -> Dict:
+        """
+        Validate the question, retrieve context and build the chat messages.
+        
+        Returns {'error': ...} for rejected input, {'result': ...} with a
+        finished response when the answer cache has one, and otherwise the
+        request state that generate_response and stream_response complete.
+        """
         question = self.security.sanitize_input(question)
         if not question:
             return {'error': 'Invalid input'}
@@ -70,65 +78,173 @@ Be concise and direct - users want quick answers, not essays."""
             if not token_check[0]:
                 return {'error': token_check[1]}
         
-        retrieved = self.retriever.retrieve(question, n_results=3)
-        context = self.build_context(retrieved)
+        # Web search runs while the question is embedded and the index searched
+        pending = self.pipeline.start(question, client_ip)
         
-        max_context_tokens = 2000
-        context_tokens = self.estimate_tokens(context)
-        if context_tokens > max_context_tokens:
-            context = context[:int(len(context) * max_context_tokens / context_tokens)]
+        # Questions without history can be answered from earlier, near-identical ones.
+        # No embedding when lexical search answers alone (symbol names, embedding API down).
+        query_embedding = pending.query_embedding()
+        if query_embedding is not None and not conversation_history:
+            cached = self.answer_cache.get(self.retriever.index_version, question, query_embedding)
+            if cached is not None:
+                pending.cancel()
+                return {'result': dict(cached, tokens={'input': 0, 'output': 0, 'total': 0}, cost=0.0, cached=True)}
         
-        messages = [{"role": "system", "content": self.system_prompt}]
+        stages = pending.finish(query_embedding, n_results=3)
+        # Web results go after the codebase context and are cut first
+        web_context = self.web_search.format_results(stages['web']).rstrip() if stages['web'] else None
+        prompt = self.prompt_builder.build(question, stages['retrieved'], conversation_history,
+                                           version=self.retriever.index_version, extra=web_context)
         
-        if conversation_history:
-            for msg in conversation_history[-1:]:  # Only last 1 message
-                msg_content = msg.get('content', '')
-                # Keep history context short (up to 100 tokens per message)
-                if self.estimate_tokens(msg_content) > 100:
-                    msg_content = msg_content[:100] + "..."
-                messages.append({"role": msg.get('role', 'user'), "content": msg_content})
+        return {
+            'question': question,
+            'query_embedding': query_embedding,
+            'cacheable': query_embedding is not None and not conversation_history,
+            'messages': prompt['messages'],
+            'prompt_tokens': prompt['prompt_tokens'],
+            'sources': stages['sources']
+        }
+    
+    def finish_response(self, request: Dict, answer: str, input_tokens: int, output_tokens: int) -> Dict:
+        answer = self.security.sanitize_response(answer)
         
-        user_message = f"Context from codebase:\n{context}\n\nQuestion: {question}\n\nProvide a concise, direct answer (2-4 sentences max):"
+        if request['cacheable']:
+            self.answer_cache.put(self.retriever.index_version, request['question'], request['query_embedding'],
+                                  {'answer': answer, 'sources': request['sources']})
         
-        total_tokens = sum(self.estimate_tokens(m.get('content', '')) for m in messages) + self.estimate_tokens(user_message)
-        if total_tokens > 4000:
-            # If still too large, reduce context but keep question
-            context = context[:1000] + "..."
-            user_message = f"Context from codebase:\n{context}\n\nQuestion: {question}\n\nProvide a concise, direct answer (2-4 sentences max):"
+        return {
+            'answer': answer,
+            'sources': request['sources'],
+            'tokens': {
+                'input': input_tokens,
+                'output': output_tokens,
+                'total': input_tokens + output_tokens
+            },
+            'cost': self.estimate_cost(input_tokens, output_tokens)
+        }
+    
+    def check_request_cost(self, request: Dict, check_cost) -> Optional[Dict]:
+        """
+        Run check_cost(worst-case cost) before a completion is paid for;
+        returns {'error': ..., 'limited': True} when it refuses.
+        """
+        if check_cost is None:
+            return None
+        allowed, error_msg = check_cost(self.estimate_cost(request['prompt_tokens'], MAX_ANSWER_TOKENS))
+        return None if allowed else {'error': error_msg, 'limited': True}
+    
+    def generate_response(self, question: str, conversation_history: List[Dict] = None, client_ip: str = 'unknown',
+                          check_cost=None) -> Dict:
+        """
+        Answer a question in one response. check_cost, e.g.
+        ChatbotSecurity.check_cost_budget, can refuse it before the
+        completion is requested.
+        """
+        request = self.prepare_request(question, conversation_history, client_ip)
+        if 'error' in request:
+            return request
+        if 'result' in request:
+            return request['result']
         
-        messages.append({"role": "user", "content": user_message})
+        refused = self.check_request_cost(request, check_cost)
+        if refused:
+            return refused
         
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=messages,
+                messages=request['messages'],
                 temperature=0.2,
-                max_tokens=500,
+                max_tokens=MAX_ANSWER_TOKENS,
                 stop=None
             )
             
-            answer = response.choices[0].message.content
-            answer = self.security.sanitize_response(answer)
-            
-            input_tokens = response.usage.prompt_tokens
-            output_tokens = response.usage.completion_tokens
-            cost = self.estimate_cost(input_tokens, output_tokens)
+            return self.finish_response(request, response.choices[0].message.content,
+                                        response.usage.prompt_tokens, response.usage.completion_tokens)
+        
+        except Exception as e:
+            return {'error': f'Error generating response: {str(e)}'}
+    
+    def stream_response(self, question: str, conversation_history: List[Dict] = None,
+                        client_ip: str = 'unknown', check_cost=None, record_cost=None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Answer a question as a sequence of (event, data) pairs.
+        
+        'sources' comes first, then one 'token' per streamed text delta and a
+        final 'done' with the sanitized answer, token counts and cost. Token
+        text is raw model output; clients show done's answer in its place.
+        Cached answers arrive as a single token. check_cost is applied as in
+        generate_response, before any event. Failures end the sequence with
+        'error'.
+        
+        record_cost(cost) is called once for every completion requested, also
+        when the stream fails or is closed early (client disconnects): with
+        the billed usage when it arrived, otherwise estimated from the prompt
+        and the text streamed so far.
+        """
+        request = self.prepare_request(question, conversation_history, client_ip)
+        if 'error' in request:
+            yield 'error', request
+            return
+        if 'result' in request:
+            result = request['result']
+            yield 'sources', {'sources': result['sources']}
+            yield 'token', {'text': result['answer']}
+            yield 'done', result
+            return
+        
+        refused = self.check_request_cost(request, check_cost)
+        if refused:
+            yield 'error', {'error': refused['error']}
+            return
+        
+        yield 'sources', {'sources': request['sources']}
+        
+        parts = []
+        usage = None
+        stream = None
+        result = None
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=request['messages'],
+                temperature=0.2,
+                max_tokens=MAX_ANSWER_TOKENS,
+                stop=None,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
             
-            # Sanitize sources - only return valid, existing file paths
-            raw_sources = [item['metadata'] for item in retrieved]
-            sanitized_sources = self.path_sanitizer.sanitize_sources(raw_sources)
+            for chunk in stream:
+                # The usage chunk comes last and has no choices
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield 'token', {'text': chunk.choices[0].delta.content}
             
-            return {
-                'answer': answer,
-                'sources': sanitized_sources,
-                'tokens': {
-                    'input': input_tokens,
-                    'output': output_tokens,
-                    'total': response.usage.total_tokens
-                },
-                'cost': cost
-            }
+            answer = ''.join(parts)
+            if usage is not None:
+                input_tokens, output_tokens = usage.prompt_tokens, usage.completion_tokens
+            else:
+                # No usage chunk (endpoints without stream_options): count locally
+                input_tokens = request['prompt_tokens']
+                output_tokens = self.estimate_tokens(answer)
+            result = self.finish_response(request, answer, input_tokens, output_tokens)
         
         except Exception as e:
-            return {'error': f'Error generating response: {str(e)}'}
-
+            yield 'error', {'error': f'Error generating response: {str(e)}'}
+            return
+        
+        finally:
+            # Runs on GeneratorExit too, so aborted streams still count against the budget
+            if record_cost is not None and stream is not None:
+                if result is not None:
+                    cost = result['cost']
+                elif usage is not None:
+                    cost = self.estimate_cost(usage.prompt_tokens, usage.completion_tokens)
+                else:
+                    cost = self.estimate_cost(request['prompt_tokens'], self.estimate_tokens(''.join(parts)))
+                record_cost(cost)
+        
+        yield 'done', result
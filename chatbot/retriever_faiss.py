@@ -3,11 +3,26 @@ from typing import List, Dict
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
-import json
+import sys
+import time
 import numpy as np
+import openai
+
+from .answer_cache import get_query_cache
+from .chunk_store import open_chunk_store
+from .embedding_cache import get_embedding_cache
+from .lexical import is_symbol_query, reciprocal_rank_fusion
+from .vector_index import apply_search_params, load_index_config, prepare_vectors, read_index, to_distances
 
 load_dotenv()
 
+RETRIEVAL_MODES = ('hybrid', 'vector', 'lexical')
+RETRIEVAL_MODE = os.getenv('CHATBOT_RETRIEVAL_MODE', 'hybrid')
+# With lexical search as fallback, a slow embedding call is given up quickly
+QUERY_EMBEDDING_TIMEOUT = float(os.getenv('CHATBOT_QUERY_EMBEDDING_TIMEOUT', '5'))
+# Seconds the embedding API is skipped after a failed query embedding
+EMBEDDING_RETRY_AFTER = 30
+
 class CodeRetriever:
     def __init__(self, db_path: Path = None):
         try:
@@ -20,9 +35,13 @@ class CodeRetriever:
         self.db_path.mkdir(exist_ok=True)
         
         self.index_file = self.db_path / 'index.faiss'
-        self.metadata_file = self.db_path / 'metadata.json'
         
-        if not self.index_file.exists() or not self.metadata_file.exists():
+        if not self.index_file.exists():
+            raise ValueError("Database not indexed. Run: python chatbot/index_codebase.py")
+        
+        # Chunk rows are read per query; databases with only metadata.json are migrated here
+        self.chunk_store = open_chunk_store(self.db_path)
+        if self.chunk_store is None:
             raise ValueError("Database not indexed. Run: python chatbot/index_codebase.py")
         
         api_key = os.getenv('OPENAI_API_KEY')
@@ -30,36 +49,115 @@ class CodeRetriever:
             raise ValueError("OPENAI_API_KEY not set in environment")
         
         self.openai_client = OpenAI(api_key=api_key)
+        self.embedding_cache = get_embedding_cache()
         
-        # Load FAISS index
-        self.index = faiss.read_index(str(self.index_file))
+        # Map FAISS index read-only; workers share its pages (see vector_index.read_index)
+        self.index = read_index(self.index_file)
         
-        # Load metadata
-        with open(self.metadata_file, 'r') as f:
-            self.metadata = json.load(f)
+        # Type and metric the index was built with; queries are prepared the same way
+        self.index_config = load_index_config(self.db_path, self.index)
+        apply_search_params(self.index, self.index_config)
+        
+        # Changes whenever the index is rebuilt; keys the query and answer caches
+        self.index_version = ':'.join(
+            f"{st.st_mtime_ns}-{st.st_size}" for st in (os.stat(self.index_file), os.stat(self.chunk_store.db_file))
+        )
+        self.query_cache = get_query_cache()
+        
+        if RETRIEVAL_MODE not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown CHATBOT_RETRIEVAL_MODE {RETRIEVAL_MODE!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+        self.mode = RETRIEVAL_MODE
+        if not self.chunk_store.has_lexical and self.mode != 'vector':
+            print("WARNING: Chunk store has no lexical index (re-index to build it), using vector search", file=sys.stderr)
+            self.mode = 'vector'
+        self.lexical = self.mode != 'vector'
+        self.query_client = self.openai_client.with_options(timeout=QUERY_EMBEDDING_TIMEOUT, max_retries=0) if self.lexical else self.openai_client
+        self.embedding_down_until = 0.0
     
-    def retrieve(self, query: str, n_results: int = 5) -> List[Dict]:
-        # Get query embedding
-        query_embedding = self.openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=[query]
-        ).data[0].embedding
+    def embed_query(self, query: str):
+        """Query embedding from the in-process LRU, the embedding cache or the API, in that order."""
+        query_embedding = self.query_cache.get(self.index_version, query)
+        if query_embedding is not None:
+            return query_embedding
+        
+        query_embedding = self.embedding_cache.get(query, "text-embedding-3-small", self.index.d) if self.embedding_cache else None
+        if query_embedding is None:
+            query_embedding = self.query_client.embeddings.create(
+                model="text-embedding-3-small",
+                input=[query]
+            ).data[0].embedding
+            if self.embedding_cache:
+                self.embedding_cache.put(query, query_embedding, "text-embedding-3-small", self.index.d)
+        
+        self.query_cache.put(self.index_version, query, query_embedding)
+        return query_embedding
+    
+    def try_embed_query(self, query: str):
+        """
+        Query embedding, or None where lexical search answers alone: in
+        lexical mode, for bare symbol or file names with lexical matches, and
+        while the embedding API is failing. Without lexical search, embedding
+        errors are raised.
+        """
+        if not self.lexical:
+            return self.embed_query(query)
+        if self.mode == 'lexical' or (is_symbol_query(query) and self.chunk_store.search(query, 1)):
+            return None
+        
+        query_embedding = self.query_cache.get(self.index_version, query)
+        if query_embedding is not None or time.time() < self.embedding_down_until:
+            return query_embedding
+        try:
+            return self.embed_query(query)
+        except openai.APIError as e:
+            self.embedding_down_until = time.time() + EMBEDDING_RETRY_AFTER
+            print(f"WARNING: Query embedding failed ({e}), using lexical search for {EMBEDDING_RETRY_AFTER}s", file=sys.stderr)
+            return None
+    
+    def retrieve(self, query: str, n_results: int = 5, query_embedding=None) -> List[Dict]:
+        """
+        Top chunks for query. In hybrid mode vector and BM25 rankings are
+        merged by reciprocal rank fusion; results carry the fused 'score' and,
+        where the vector search found them, their 'distance'. 'tokens' and
+        'preview' are the chunk's token count and leading tokens as text.
+        """
+        candidates = max(n_results * 4, 20)
+        lexical = self.chunk_store.search(query, candidates) if self.lexical else []
+        if query_embedding is None:
+            query_embedding = self.try_embed_query(query)
+        
+        distances = {}
+        if query_embedding is not None:
+            # Normalized for cosine indexes
+            query_vector = prepare_vectors([query_embedding], self.index_config['metric'])
+            
+            # Search in FAISS index
+            scores, indices = self.index.search(query_vector, candidates if lexical else n_results)
+            distances = {int(idx): float(d) for idx, d in zip(indices[0], to_distances(scores, self.index_config['metric'])[0]) if idx >= 0}
         
-        # Convert to numpy array
-        query_vector = np.array([query_embedding], dtype='float32')
+        if lexical and distances:
+            ranked = reciprocal_rank_fusion([list(distances), [faiss_id for faiss_id, _ in lexical]])[:n_results]
+        else:
+            ranked = lexical[:n_results] or [(faiss_id, None) for faiss_id in list(distances)[:n_results]]
         
-        # Search in FAISS index
-        distances, indices = self.index.search(query_vector, n_results)
+        # Only the rows for the returned ids are read
+        docs = self.chunk_store.get_many(faiss_id for faiss_id, _ in ranked)
         
         retrieved = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
-                doc = self.metadata[idx]
+        for faiss_id, score in ranked:
+            doc = docs.get(faiss_id)
+            if doc is not None:
                 retrieved.append({
-                    'id': doc.get('id', str(idx)),
+                    'id': doc.get('id', str(faiss_id)),
                     'text': doc.get('text', ''),
                     'metadata': doc.get('metadata', {}),
-                    'distance': float(distances[0][i]) if distances is not None else None
+                    'faiss_id': faiss_id,
+                    # Stored at index time; None for stores written before
+                    'tokens': doc.get('tokens'),
+                    'preview': doc.get('preview'),
+                    'preview_tokens': doc.get('preview_tokens'),
+                    'distance': distances.get(faiss_id),
+                    'score': score
                 })
         
         return retrieved
@@ -1,16 +1,15 @@
 import os
 import time
-from collections import defaultdict
 from functools import wraps
 from flask import request, jsonify
 import re
 import html
+from .rate_limit import get_default_store
 
 class ChatbotSecurity:
-    def __init__(self):
-        self.rate_limits = defaultdict(list)
-        self.blocked_ips = set()
-        self.daily_costs = defaultdict(float)
+    def __init__(self, store=None):
+        # Counters live in a shared store so limits hold across requests and workers
+        self.store = store or get_default_store()
         self.max_questions_per_minute = int(os.getenv('CHATBOT_MAX_QUESTIONS_PER_MINUTE', '5'))
         self.max_questions_per_hour = int(os.getenv('CHATBOT_MAX_QUESTIONS_PER_HOUR', '20'))
         self.max_questions_per_day = int(os.getenv('CHATBOT_MAX_QUESTIONS_PER_DAY', '100'))
@@ -24,32 +23,31 @@ class ChatbotSecurity:
         return request.remote_addr
     
     def is_blocked(self, ip):
-        return ip in self.blocked_ips
+        return self.store.is_blocked(f"chat:{ip}")
     
     def block_ip(self, ip):
-        self.blocked_ips.add(ip)
+        self.store.block(f"chat:{ip}")
     
     def check_rate_limit(self, ip):
         if self.is_blocked(ip):
             return False, "IP address blocked due to abuse"
         
-        now = time.time()
-        self.rate_limits[ip] = [t for t in self.rate_limits[ip] if now - t < 86400]
-        
-        recent_minute = [t for t in self.rate_limits[ip] if now - t < 60]
-        recent_hour = [t for t in self.rate_limits[ip] if now - t < 3600]
-        recent_day = len(self.rate_limits[ip])
+        limits = [
+            (self.max_questions_per_minute, 60),
+            (self.max_questions_per_hour, 3600),
+            (self.max_questions_per_day, 86400),
+        ]
+        violated = self.store.hit(f"chat:{ip}", limits)
         
-        if len(recent_minute) >= self.max_questions_per_minute:
+        if violated == 0:
             return False, f"Rate limit exceeded: {self.max_questions_per_minute} questions per minute"
         
-        if len(recent_hour) >= self.max_questions_per_hour:
+        if violated == 1:
             return False, f"Rate limit exceeded: {self.max_questions_per_hour} questions per hour"
         
-        if recent_day >= self.max_questions_per_day:
+        if violated == 2:
             return False, f"Rate limit exceeded: {self.max_questions_per_day} questions per day"
         
-        self.rate_limits[ip].append(now)
         return True, None
     
     def sanitize_input(self, text):
@@ -122,14 +120,26 @@ class ChatbotSecurity:
         
         return text.strip()
     
-    def check_cost_limit(self, ip, cost):
-        today = time.strftime('%Y-%m-%d')
-        self.daily_costs[today] += cost
+    def check_cost_budget(self, expected_cost=0.0):
+        """
+        Refuse a request up front once the site-wide daily budget is spent.
         
-        if self.daily_costs[today] > self.max_cost_per_day:
-            self.block_ip(ip)
+        The budget is shared by all clients, so running out blocks no one.
+        """
+        today = time.strftime('%Y-%m-%d')
+        if self.store.get_cost(f"chat:{today}") + expected_cost >= self.max_cost_per_day:
             return False, "Daily cost limit exceeded"
         
+        if expected_cost > 0.01:
+            return False, "Request cost too high"
+        
+        return True, None
+    
+    def check_cost_limit(self, ip, cost):
+        """Record the cost of an answered request; a single request over $0.01 blocks its client."""
+        today = time.strftime('%Y-%m-%d')
+        self.store.add_cost(f"chat:{today}", cost)
+        
         if cost > 0.01:
             self.block_ip(ip)
             return False, "Request cost too high"
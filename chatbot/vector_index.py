@@ -0,0 +1,197 @@
+"""
+Vector Index
+FAISS index construction for the chatbot vector store.
+
+The index type is exact (flat) for small corpora and approximate (HNSW,
+IVF-Flat, IVF-PQ, SQ8) for large ones, chosen from the corpus size unless
+CHATBOT_INDEX_TYPE names one. Cosine similarity is an inner product over
+L2-normalized vectors. The chosen type, metric and parameters are written to
+index_config.json next to index.faiss, so the retriever prepares queries and
+sets search parameters the way the index was built.
+
+Retrievers map the index file read-only (read_index) instead of copying it
+onto each process's heap, so all workers share one copy in the page cache.
+"""
+
+import json
+import math
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf_flat', 'ivf_pq', 'sq8')
+METRICS = ('cosine', 'l2')
+
+# 'auto' picks by corpus size: flat, then HNSW, then IVF-PQ
+INDEX_TYPE = os.getenv('CHATBOT_INDEX_TYPE', 'auto')
+INDEX_METRIC = os.getenv('CHATBOT_INDEX_METRIC', 'cosine')
+HNSW_MIN_VECTORS = 20_000
+IVF_PQ_MIN_VECTORS = 500_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = int(os.getenv('CHATBOT_HNSW_EF_SEARCH', '64'))
+# 0 derives nprobe from the number of lists
+IVF_NPROBE = int(os.getenv('CHATBOT_IVF_NPROBE', '0'))
+# k-means wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS = 100_000
+
+CONFIG_FILENAME = 'index_config.json'
+
+# Map index files for searching instead of reading them onto the heap
+INDEX_MMAP = os.getenv('CHATBOT_INDEX_MMAP', 'true').lower() == 'true'
+
+# Types whose stored vectors are exact, so the index can be rebuilt without re-embedding
+LOSSLESS_TYPES = {'flat', 'hnsw'}
+# HNSW graphs cannot drop vectors; removals rebuild the index
+REMOVABLE_TYPES = {'flat', 'ivf_flat', 'ivf_pq', 'sq8'}
+
+
+def choose_index_config(n_vectors: int, dim: int, index_type: str = INDEX_TYPE, metric: str = INDEX_METRIC) -> Dict:
+    """Index type, metric and parameters for n_vectors vectors of dimension dim."""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown index metric {metric!r}, expected one of {', '.join(METRICS)}")
+    if index_type == 'auto':
+        if n_vectors < HNSW_MIN_VECTORS:
+            index_type = 'flat'
+        elif n_vectors < IVF_PQ_MIN_VECTORS:
+            index_type = 'hnsw'
+        else:
+            index_type = 'ivf_pq'
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected 'auto' or one of {', '.join(INDEX_TYPES)}")
+
+    config = {'type': index_type, 'metric': metric, 'dim': dim, 'trained_on': n_vectors, 'params': {}}
+    params = config['params']
+
+    if index_type == 'flat':
+        config['factory'] = 'Flat'
+    elif index_type == 'sq8':
+        config['factory'] = 'SQ8'
+    elif index_type == 'hnsw':
+        config['factory'] = f'HNSW{HNSW_M},Flat'
+        params['efConstruction'] = HNSW_EF_CONSTRUCTION
+        params['efSearch'] = HNSW_EF_SEARCH
+    else:
+        nlist = int(round(4 * math.sqrt(max(n_vectors, 1))))
+        nlist = max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+        params['nlist'] = nlist
+        params['nprobe'] = IVF_NPROBE or max(1, min(nlist, int(round(math.sqrt(nlist)))))
+        if index_type == 'ivf_flat':
+            config['factory'] = f'IVF{nlist},Flat'
+        else:
+            # About 16 dimensions per sub-quantizer: 96 bytes per 1536-d vector
+            m = max(d for d in range(1, max(1, dim // 16) + 1) if dim % d == 0)
+            nbits = max(1, min(8, int(math.log2(max(2, n_vectors // MIN_POINTS_PER_CENTROID)))))
+            params['m'] = m
+            params['nbits'] = nbits
+            config['factory'] = f'IVF{nlist},PQ{m}x{nbits}'
+    return config
+
+
+def needs_rebuild(old_config: Dict, new_config: Dict, removing: bool) -> bool:
+    """Whether an index built with old_config must be rebuilt rather than updated in place."""
+    if any(old_config.get(key) != new_config[key] for key in ('type', 'metric', 'dim')):
+        return True
+    if removing and old_config['type'] not in REMOVABLE_TYPES:
+        return True
+    if old_config['type'] in ('ivf_flat', 'ivf_pq'):
+        # Centroids trained on a much smaller or larger corpus no longer fit it
+        trained_on = max(old_config.get('trained_on', 0), 1)
+        return not trained_on / 2 <= new_config['trained_on'] <= trained_on * 2
+    return False
+
+
+def prepare_vectors(vectors, metric: str) -> np.ndarray:
+    """float32 copy of vectors, L2-normalized for cosine."""
+    array = np.array(vectors, dtype='float32', ndmin=2)
+    if metric == 'cosine':
+        faiss.normalize_L2(array)
+    return array
+
+
+def to_distances(scores: np.ndarray, metric: str) -> np.ndarray:
+    """Search scores as distances, smaller is closer (1 - similarity for cosine)."""
+    return 1.0 - scores if metric == 'cosine' else scores
+
+
+def build_index(config: Dict, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """Create, train and fill an id-mapped index; vectors must already be prepared."""
+    metric = faiss.METRIC_INNER_PRODUCT if config['metric'] == 'cosine' else faiss.METRIC_L2
+    base = faiss.index_factory(config['dim'], config['factory'], metric)
+    if config['type'] == 'hnsw':
+        faiss.downcast_index(base).hnsw.efConstruction = config['params']['efConstruction']
+
+    index = faiss.IndexIDMap2(base)
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > MAX_TRAINING_POINTS:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), MAX_TRAINING_POINTS, replace=False)]
+        index.train(sample)
+    if len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+    apply_search_params(index, config)
+    return index
+
+
+def apply_search_params(index: faiss.Index, config: Dict):
+    params = config.get('params', {})
+    space = faiss.ParameterSpace()
+    if config.get('type') == 'hnsw' and 'efSearch' in params:
+        space.set_index_parameter(index, 'efSearch', params['efSearch'])
+    if config.get('type') in ('ivf_flat', 'ivf_pq') and 'nprobe' in params:
+        space.set_index_parameter(index, 'nprobe', params['nprobe'])
+
+
+def reconstruct_vectors(index: faiss.Index, config: Dict, ids: List[int]) -> Optional[np.ndarray]:
+    """Stored vectors for ids, or None if the index type does not keep them exactly."""
+    if config.get('type') not in LOSSLESS_TYPES or not isinstance(index, faiss.IndexIDMap):
+        return None
+    stored = faiss.vector_to_array(index.id_map)
+    positions = {int(faiss_id): i for i, faiss_id in enumerate(stored)}
+    if any(faiss_id not in positions for faiss_id in ids):
+        return None
+    vectors = index.index.reconstruct_n(0, index.ntotal)
+    return vectors[[positions[faiss_id] for faiss_id in ids]]
+
+
+def read_index(index_file: Path, mmap: bool = INDEX_MMAP) -> faiss.Index:
+    """
+    Load an index for searching.
+
+    With mmap, vector and code arrays stay in the file mapping: pages are
+    loaded on demand and shared by every process that maps the file, and the
+    index is read-only. The indexer replaces index files atomically, so a
+    mapped index keeps seeing the file it was opened on. Older FAISS builds
+    without the flag fall back to a regular read.
+    """
+    flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+    if mmap and flag is not None:
+        try:
+            return faiss.read_index(str(index_file), flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"WARNING: Cannot map {index_file} ({e}), reading it into memory", file=sys.stderr)
+    return faiss.read_index(str(index_file))
+
+
+def load_index_config(db_path: Path, index: faiss.Index) -> Dict:
+    """Recorded config, or one inferred from the index for databases built before it existed."""
+    try:
+        with open(Path(db_path) / CONFIG_FILENAME, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        metric = 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+        return {'type': 'flat', 'metric': metric, 'dim': index.d, 'trained_on': index.ntotal, 'params': {}}
+
+
+def write_index_config(db_path: Path, config: Dict):
+    config_file = Path(db_path) / CONFIG_FILENAME
+    with open(str(config_file) + '.tmp', 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(str(config_file) + '.tmp', config_file)
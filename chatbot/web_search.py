@@ -1,51 +1,135 @@
+"""
+Web Search
+DuckDuckGo Instant Answer lookups for the chatbot.
+
+Requests go through one keep-alive session per process, so repeated
+searches reuse the TLS connection. Successful results are kept in a TTL +
+LRU cache keyed by the normalized query; cached searches make no request
+and do not count against the rate limit. Limits are counted in the same
+store as the chat limits (see rate_limit), so they hold across workers.
+"""
+
+import asyncio
 import os
-import requests
+import threading
 import time
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
-from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from .answer_cache import normalize_question
+from .rate_limit import get_default_store
+
 load_dotenv()
 
+WEB_SEARCH_CACHE_SIZE = int(os.getenv('WEB_SEARCH_CACHE_SIZE', '256'))
+WEB_SEARCH_CACHE_TTL = int(os.getenv('WEB_SEARCH_CACHE_TTL', '3600'))
+# Connections kept open per host; about one per concurrent search
+WEB_SEARCH_POOL_SIZE = int(os.getenv('WEB_SEARCH_POOL_SIZE', '8'))
+
+
+class SearchResultCache:
+    """Bounded LRU of query -> results whose entries expire after ttl seconds."""
+    
+    def __init__(self, max_entries: int = WEB_SEARCH_CACHE_SIZE, ttl: int = WEB_SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Dict]]' = OrderedDict()
+    
+    def get(self, query: str) -> Optional[Dict]:
+        key = normalize_question(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, query: str, result: Dict):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        key = normalize_question(query)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_result_cache = SearchResultCache()
+_session: Optional[requests.Session] = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session; pooled connections must not cross a fork."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WEB_SEARCH_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
 class WebSearch:
-    def __init__(self):
-        self.rate_limits = defaultdict(list)
+    def __init__(self, store=None, cache: SearchResultCache = None):
+        # Counters live in the chat rate limit store, under their own keys
+        self.store = store or get_default_store()
+        self.cache = cache or _result_cache
         self.max_searches_per_minute = int(os.getenv('WEB_SEARCH_MAX_PER_MINUTE', '5'))
         self.max_searches_per_hour = int(os.getenv('WEB_SEARCH_MAX_PER_HOUR', '20'))
         self.max_searches_per_day = int(os.getenv('WEB_SEARCH_MAX_PER_DAY', '100'))
         self.duckduckgo_api = os.getenv('DUCKDUCKGO_API_KEY', '')
+        # Overridable to point at a local stub of the Instant Answer API
+        self.api_url = os.getenv('DUCKDUCKGO_API_URL', 'https://api.duckduckgo.com/')
     
     def check_rate_limit(self, ip: str) -> Tuple[bool, Optional[str]]:
-        now = time.time()
-        self.rate_limits[ip] = [t for t in self.rate_limits[ip] if now - t < 86400]
+        limits = [
+            (self.max_searches_per_minute, 60),
+            (self.max_searches_per_hour, 3600),
+            (self.max_searches_per_day, 86400),
+        ]
+        violated = self.store.hit(f"web:{ip}", limits)
         
-        recent_minute = [t for t in self.rate_limits[ip] if now - t < 60]
-        recent_hour = [t for t in self.rate_limits[ip] if now - t < 3600]
-        recent_day = len(self.rate_limits[ip])
-        
-        if len(recent_minute) >= self.max_searches_per_minute:
+        if violated == 0:
             return False, f"Web search rate limit exceeded: {self.max_searches_per_minute} searches per minute"
         
-        if len(recent_hour) >= self.max_searches_per_hour:
+        if violated == 1:
             return False, f"Web search rate limit exceeded: {self.max_searches_per_hour} searches per hour"
         
-        if recent_day >= self.max_searches_per_day:
+        if violated == 2:
             return False, f"Web search rate limit exceeded: {self.max_searches_per_day} searches per day"
         
-        self.rate_limits[ip].append(now)
         return True, None
     
     def search(self, query: str, ip: str = 'unknown', max_results: int = 5) -> Dict:
-        allowed, error_msg = self.check_rate_limit(ip)
-        if not allowed:
-            return {'error': error_msg, 'results': []}
-        
         query = query.strip()[:200]
         if not query:
             return {'error': 'Empty query', 'results': []}
         
+        cached = self.cache.get(query)
+        if cached is not None:
+            results = cached['results']
+            return {'query': query, 'results': results[:max_results], 'count': len(results), 'cached': True}
+        
+        allowed, error_msg = self.check_rate_limit(ip)
+        if not allowed:
+            return {'error': error_msg, 'results': []}
+        
         try:
-            url = "https://api.duckduckgo.com/"
+            url = self.api_url
             params = {
                 'q': query,
                 'format': 'json',
@@ -53,13 +137,13 @@ class WebSearch:
                 'skip_disambig': '1'
             }
             
-            response = requests.get(url, params=params, timeout=5)
+            response = get_session().get(url, params=params, timeout=5)
             response.raise_for_status()
             data = response.json()
             
             results = []
             if 'RelatedTopics' in data:
-                for topic in data['RelatedTopics'][:max_results]:
+                for topic in data['RelatedTopics']:
                     if 'Text' in topic and 'FirstURL' in topic:
                         results.append({
                             'title': topic.get('Text', '')[:100],
@@ -74,6 +158,9 @@ class WebSearch:
                     'snippet': data.get('AbstractText', '')[:300]
                 })
             
+            # All results are cached, so a later search may ask for more of them
+            self.cache.put(query, {'results': results})
+            
             return {
                 'query': query,
                 'results': results[:max_results],
@@ -85,6 +172,11 @@ class WebSearch:
         except Exception as e:
             return {'error': f'Search error: {str(e)}', 'results': []}
     
+    async def search_async(self, query: str, ip: str = 'unknown', max_results: int = 5) -> Dict:
+        """search for asyncio callers; the request runs in the loop's default executor on the pooled session."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.search, query, ip, max_results)
+    
     def format_results(self, search_result: Dict) -> str:
         if 'error' in search_result:
             return f"Web search unavailable: {search_result['error']}"
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for running the app with several workers.
+
+Usage: gunicorn -c gunicorn.conf.py app:app
+
+With CHATBOT_PRELOAD (default on) the app is imported once in the master
+before the workers are forked. The chatbot warm-up in app.py then loads the
+engine there: the memory-mapped FAISS index, the chunk store and the
+clients are inherited by every worker and shared copy-on-write instead of
+being loaded N times. SQLite connections are opened per process, so nothing
+opened in the master is used across the fork.
+"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"127.0.0.1:{os.getenv('FLASK_PORT', '5001')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+
+preload_app = os.getenv('CHATBOT_PRELOAD', 'true').lower() == 'true'
+if preload_app:
+    # The master loads the engine so forked workers share it
+    os.environ.setdefault('CHATBOT_WARMUP', 'true')
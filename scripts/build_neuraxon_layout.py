@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Prewarm the layout cache with force-directed layouts for every Neuraxon frame.
+
+Usage: python scripts/build_neuraxon_layout.py [export_dir]
+Reads the frame store (or the JSON export) in data/neuraxon_exports and
+stores one layout per frame in layout_cache/ next to it, keyed by the frame
+content. Frames already in the cache are skipped, so rerunning after a new
+export only lays out the frames that changed. Requires scipy.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.layout_cache import CACHE_DIRNAME, frame_layout_key, get_layout_cache
+from utils.neuraxon_layout import force_directed_layout, frame_edge_index
+from utils.neuraxon_store import get_frame_source
+
+EXPORT_DIR = Path(__file__).parent.parent / 'data' / 'neuraxon_exports'
+
+if __name__ == '__main__':
+    export_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else EXPORT_DIR
+
+    source = get_frame_source(export_dir)
+    if source is None:
+        print(f"❌ No frame store or export found in: {export_dir}")
+        sys.exit(1)
+
+    cache = get_layout_cache(export_dir / CACHE_DIRNAME)
+    if source.frame_count > cache.max_entries:
+        print(f"⚠️  {source.frame_count} frames but the cache keeps {cache.max_entries} entries; "
+              f"raise NEURAXON_LAYOUT_CACHE_MAX_ENTRIES")
+
+    computed = 0
+    for i in range(source.frame_count):
+        columns = source.read_columns(i)
+        key = frame_layout_key(columns, seed=42 + i)
+        if cache.get(key) is not None:
+            continue
+
+        started = time.time()
+        edges, weights = frame_edge_index(columns)
+        cache.put(key, force_directed_layout(columns['layout_size'], edges, weights, seed=42 + i))
+        computed += 1
+        print(f"Frame {i}: {columns['layout_size']} nodes, {len(edges)} edges in {time.time() - started:.1f}s")
+
+    stats = cache.stats()
+    print(f"Computed {computed} of {source.frame_count} frames")
+    print(f"Cache {cache.cache_dir}: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Convert the Neuraxon network export into a frame-indexed store.
+
+Usage: python scripts/build_neuraxon_store.py [export_file] [store_file]
+Defaults to data/neuraxon_exports/real_ids_network.json(.gz) and writes
+real_ids_network.nxfs next to it.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.neuraxon_store import convert_export, STORE_FILENAME
+
+EXPORT_DIR = Path(__file__).parent.parent / 'data' / 'neuraxon_exports'
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        export_file = Path(sys.argv[1])
+    else:
+        export_file = EXPORT_DIR / 'real_ids_network.json.gz'
+        if not export_file.exists():
+            export_file = EXPORT_DIR / 'real_ids_network.json'
+
+    store_file = Path(sys.argv[2]) if len(sys.argv) > 2 else export_file.parent / STORE_FILENAME
+
+    if not export_file.exists():
+        print(f"❌ Export file not found: {export_file}")
+        sys.exit(1)
+
+    print(f"Converting {export_file} ...")
+    header = convert_export(export_file, store_file)
+    print(f"Wrote {store_file}")
+    print(f"Frames: {header['frame_count']}, nodes: {header['total_nodes']}, edges: {header['total_edges']}")
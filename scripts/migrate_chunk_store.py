@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Convert a FAISS database's metadata.json into the SQLite chunk store.
+
+Usage: python scripts/migrate_chunk_store.py [db_dir]
+Writes chunks.sqlite3 next to index.faiss (default: faiss_db). The
+retriever migrates on first load as well; running this before deploying
+keeps read-only deployments from migrating into their temp dir. Once the
+store is in place, metadata.json can be deleted.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chatbot.chunk_store import LEGACY_METADATA_FILENAME, ChunkStore, migrate_metadata_json
+
+DB_DIR = Path(__file__).parent.parent / 'faiss_db'
+
+if __name__ == '__main__':
+    db_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_DIR
+
+    metadata_file = db_dir / LEGACY_METADATA_FILENAME
+    if not metadata_file.exists():
+        print(f"❌ No {LEGACY_METADATA_FILENAME} found in: {db_dir}")
+        sys.exit(1)
+
+    store = ChunkStore(migrate_metadata_json(db_dir))
+    print(f"Migrated {store.count()} chunks to {store.db_file}")
+    print(f"{metadata_file.stat().st_size / 1024:.0f} KB JSON -> {store.db_file.stat().st_size / 1024:.0f} KB store")
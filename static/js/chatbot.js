@@ -110,14 +110,37 @@
         showLoading();
         hideError();
         
-        fetch('/api/chat', {
+        const history = chatbot.conversationHistory.slice(-5);
+        const request = window.ReadableStream && window.TextDecoder ? streamChat(question, history) : fetchChat(question, history);
+        
+        request
+        .then(answer => {
+            chatbot.conversationHistory.push(
+                { role: 'user', content: question },
+                { role: 'assistant', content: answer }
+            );
+        })
+        .catch(error => {
+            hideLoading();
+            showError(error.message || 'Failed to get response');
+        })
+        .finally(() => {
+            chatbot.input.disabled = false;
+            chatbot.send.disabled = false;
+            chatbot.isLoading = false;
+            chatbot.input.focus();
+        });
+    }
+    
+    function postChat(url, question, history) {
+        return fetch(url, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
                 question: question,
-                history: chatbot.conversationHistory.slice(-5)
+                history: history
             })
         })
         .then(response => {
@@ -126,29 +149,94 @@
                     throw new Error(data.error || 'Request failed');
                 });
             }
-            return response.json();
-        })
+            return response;
+        });
+    }
+    
+    // Whole answer in one JSON response; resolves to the answer text
+    function fetchChat(question, history) {
+        return postChat('/api/chat', question, history)
+        .then(response => response.json())
         .then(data => {
             hideLoading();
             if (data.error) {
-                showError(data.error);
-            } else {
-                addMessage('assistant', data.answer, data.sources);
-                chatbot.conversationHistory.push(
-                    { role: 'user', content: question },
-                    { role: 'assistant', content: data.answer }
-                );
+                throw new Error(data.error);
+            }
+            addMessage('assistant', data.answer, data.sources);
+            return data.answer;
+        });
+    }
+    
+    // Answer rendered as it is generated, from the Server-Sent Events of /api/chat/stream
+    function streamChat(question, history) {
+        let message = null;
+        let text = '';
+        let answer = null;
+        
+        function handleEvent(event, data) {
+            if (event === 'error') {
+                throw new Error(data.error || 'Request failed');
+            }
+            if (!message) {
+                hideLoading();
+                message = addMessage('assistant', '');
+            }
+            if (event === 'sources') {
+                renderSources(message, data.sources);
+            } else if (event === 'token') {
+                text += data.text;
+                message.querySelector('p').textContent = text;
+                chatbot.messages.scrollTop = chatbot.messages.scrollHeight;
+            } else if (event === 'done') {
+                // Streamed tokens are raw model output; show the sanitized answer
+                answer = data.answer;
+                message.querySelector('p').textContent = answer;
+            }
+        }
+        
+        return postChat('/api/chat/stream', question, history)
+        .then(response => {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                    // Events are separated by a blank line
+                    let end;
+                    while ((end = buffer.indexOf('\n\n')) !== -1) {
+                        const block = buffer.slice(0, end);
+                        buffer = buffer.slice(end + 2);
+                        let event = 'message';
+                        const data = [];
+                        block.split('\n').forEach(line => {
+                            if (line.startsWith('event:')) {
+                                event = line.slice(6).trim();
+                            } else if (line.startsWith('data:')) {
+                                data.push(line.slice(5).trim());
+                            }
+                        });
+                        if (data.length) {
+                            handleEvent(event, JSON.parse(data.join('\n')));
+                        }
+                    }
+                    if (done) {
+                        if (answer === null) {
+                            throw new Error('Response ended early');
+                        }
+                        return answer;
+                    }
+                    return read();
+                });
             }
+            return read();
         })
         .catch(error => {
-            hideLoading();
-            showError(error.message || 'Failed to get response');
-        })
-        .finally(() => {
-            chatbot.input.disabled = false;
-            chatbot.send.disabled = false;
-            chatbot.isLoading = false;
-            chatbot.input.focus();
+            if (message && !answer) {
+                message.remove();
+            }
+            throw error;
         });
     }
     
@@ -160,6 +248,14 @@
         p.textContent = text;
         messageDiv.appendChild(p);
         
+        renderSources(messageDiv, sources);
+        
+        chatbot.messages.appendChild(messageDiv);
+        chatbot.messages.scrollTop = chatbot.messages.scrollHeight;
+        return messageDiv;
+    }
+    
+    function renderSources(messageDiv, sources) {
         if (sources && sources.length > 0) {
             const sourcesDiv = document.createElement('div');
             sourcesDiv.className = 'chatbot-sources';
@@ -200,9 +296,6 @@
             sourcesDiv.innerHTML = sourcesHtml;
             messageDiv.appendChild(sourcesDiv);
         }
-        
-        chatbot.messages.appendChild(messageDiv);
-        chatbot.messages.scrollTop = chatbot.messages.scrollHeight;
     }
     
     function showLoading() {
@@ -0,0 +1,101 @@
+const FRAME_REQUEST_FIELDS = 'index,frame_id,start_index,end_index,display_nodes,connections';
+const pendingFrames = {};
+
+function defineLazy(obj, name, build) {
+    Object.defineProperty(obj, name, {
+        configurable: true,
+        enumerable: true,
+        get() {
+            const value = build();
+            Object.defineProperty(obj, name, { value, writable: true, enumerable: true });
+            return value;
+        }
+    });
+}
+
+function columnsToRecords(columns, names) {
+    const length = columns[names[0]] ? columns[names[0]].length : 0;
+    const records = new Array(length);
+    for (let i = 0; i < length; i++) {
+        const record = {};
+        names.forEach(name => {
+            record[name] = columns[name][i];
+        });
+        records[i] = record;
+    }
+    return records;
+}
+
+// Columnar frames are rendered straight from node_columns/edge_columns (viz.js);
+// node and connection objects are only built when tables or popups ask for them
+function expandColumnarFrame(frame) {
+    const nodeColumns = frame.node_columns || {};
+    const edgeColumns = frame.edge_columns || {};
+    const types = frame.neuron_types || [];
+    
+    defineLazy(frame, 'display_nodes', () => {
+        const records = columnsToRecords(nodeColumns, Object.keys(nodeColumns));
+        records.forEach(node => {
+            node.neuron_id = node.id;
+            if (node.neuron_type !== undefined) {
+                node.neuron_type = types[node.neuron_type];
+            }
+        });
+        return records;
+    });
+    defineLazy(frame, 'nodes', () => {
+        const nodes = {};
+        frame.display_nodes.forEach(node => {
+            nodes[String(node.id)] = node;
+        });
+        return nodes;
+    });
+    defineLazy(frame, 'connections', () => columnsToRecords(edgeColumns, Object.keys(edgeColumns)));
+    return frame;
+}
+
+function loadFrame(index) {
+    if (!window.FRAME_DATA || index < 0 || index >= window.FRAME_DATA.length) {
+        return Promise.reject(new Error('Frame ' + index + ' out of range'));
+    }
+    
+    if (window.FRAME_DATA[index]) {
+        return Promise.resolve(window.FRAME_DATA[index]);
+    }
+    
+    if (pendingFrames[index]) {
+        return pendingFrames[index];
+    }
+    
+    pendingFrames[index] = fetch(`/api/neuraxon-data?frames=${index}&fields=${FRAME_REQUEST_FIELDS}&format=columns`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        })
+        .then(data => {
+            const frame = data.metadata?.frames?.[0];
+            if (!frame) {
+                throw new Error('Frame ' + index + ' not available');
+            }
+            window.FRAME_DATA[index] = expandColumnarFrame(frame);
+            return window.FRAME_DATA[index];
+        })
+        .finally(() => {
+            delete pendingFrames[index];
+        });
+    
+    return pendingFrames[index];
+}
+
+function prefetchNeighbourFrames(index) {
+    [index + 1, index - 1].forEach(i => {
+        if (i >= 0 && i < window.FRAME_DATA.length && !window.FRAME_DATA[i]) {
+            loadFrame(i).catch(error => console.warn('Prefetch failed for frame ' + i, error));
+        }
+    });
+}
+
+window.loadFrame = loadFrame;
+window.prefetchNeighbourFrames = prefetchNeighbourFrames;
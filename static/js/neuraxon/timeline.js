@@ -105,7 +105,7 @@ function setupTimeline(frames) {
 }
 
 function goToFrame(index, animatePlot = true) {
-    if (!window.FRAME_DATA || !window.FRAME_DATA.length) return;
+    if (!window.FRAME_DATA || !window.FRAME_DATA.length) return Promise.resolve();
     
     const clamped = Math.max(0, Math.min(index, window.FRAME_DATA.length - 1));
     window.currentFrameIndex = clamped;
@@ -128,14 +128,26 @@ function goToFrame(index, animatePlot = true) {
         window.savedCamera = plotEl._fullLayout.scene.camera;
     }
     
-    const frame = window.FRAME_DATA[clamped];
-    if (frame && window.renderFrame3D) {
-        window.renderFrame3D(clamped, window.FRAME_DATA);
-    }
+    const loaded = window.loadFrame ? window.loadFrame(clamped) : Promise.resolve(window.FRAME_DATA[clamped]);
     
-    if (window.renderTables) {
-        window.renderTables(clamped, window.FRAME_DATA);
-    }
+    return loaded.then(frame => {
+        // The user may have moved on while this frame was loading
+        if (window.currentFrameIndex !== clamped) return;
+        
+        if (frame && window.renderFrame3D) {
+            window.renderFrame3D(clamped, window.FRAME_DATA);
+        }
+        
+        if (window.renderTables) {
+            window.renderTables(clamped, window.FRAME_DATA);
+        }
+        
+        if (window.prefetchNeighbourFrames) {
+            window.prefetchNeighbourFrames(clamped);
+        }
+    }).catch(error => {
+        console.error('Error loading frame ' + (clamped + 1) + ':', error);
+    });
 }
 
 function startTimelinePlayback() {
@@ -187,38 +199,59 @@ function handleNeuronSearch(event) {
         return;
     }
     
-    let foundFrame = null;
+    // Only frames whose node ID range can contain the neuron need to be loaded
+    const summaries = window.FRAME_SUMMARIES || [];
+    const candidates = [];
     for (let i = 0; i < window.FRAME_DATA.length; i++) {
-        const frame = window.FRAME_DATA[i];
-        const nodes = frame.nodes || {};
-        if (nodes[String(neuronId)] || nodes[neuronId]) {
-            foundFrame = i;
-            break;
+        const summary = summaries[i];
+        if (!summary || summary.node_id_min === undefined || summary.node_id_min === null ||
+            (neuronId >= summary.node_id_min && neuronId <= summary.node_id_max)) {
+            candidates.push(i);
         }
     }
     
-    if (foundFrame === null) {
-        feedback.textContent = `Neuron ${neuronId} not found in any frame.`;
-        feedback.className = 'timeline-search-feedback error';
-        return;
-    }
+    feedback.textContent = `Searching for neuron #${neuronId}…`;
+    feedback.className = 'timeline-search-feedback';
     
-    feedback.textContent = `Jumping to neuron #${neuronId} (frame ${foundFrame + 1}/${window.FRAME_DATA.length})…`;
-    feedback.className = 'timeline-search-feedback success';
+    findNeuronFrame(neuronId, candidates).then(foundFrame => {
+        if (foundFrame === null) {
+            feedback.textContent = `Neuron ${neuronId} not found in any frame.`;
+            feedback.className = 'timeline-search-feedback error';
+            return;
+        }
+        
+        feedback.textContent = `Jumping to neuron #${neuronId} (frame ${foundFrame + 1}/${window.FRAME_DATA.length})…`;
+        feedback.className = 'timeline-search-feedback success';
+        
+        stopTimelinePlayback();
+        goToFrame(foundFrame, false);
+        
+        setTimeout(() => {
+            if (window.selectNodeById) {
+                window.selectNodeById(neuronId);
+            }
+            if (window.scrollToNeuronInTable) {
+                setTimeout(() => {
+                    window.scrollToNeuronInTable(neuronId);
+                }, 500);
+            }
+        }, 500);
+    });
+}
+
+function findNeuronFrame(neuronId, candidates) {
+    if (!candidates.length) return Promise.resolve(null);
     
-    stopTimelinePlayback();
-    goToFrame(foundFrame, false);
+    const index = candidates[0];
+    const loaded = window.loadFrame ? window.loadFrame(index) : Promise.resolve(window.FRAME_DATA[index]);
     
-    setTimeout(() => {
-        if (window.selectNodeById) {
-            window.selectNodeById(neuronId);
-        }
-        if (window.scrollToNeuronInTable) {
-            setTimeout(() => {
-                window.scrollToNeuronInTable(neuronId);
-            }, 500);
+    return loaded.then(frame => {
+        const nodes = (frame && frame.nodes) || {};
+        if (nodes[String(neuronId)] || nodes[neuronId]) {
+            return index;
         }
-    }, 500);
+        return findNeuronFrame(neuronId, candidates.slice(1));
+    }).catch(() => findNeuronFrame(neuronId, candidates.slice(1)));
 }
 
 window.setupTimeline = setupTimeline;
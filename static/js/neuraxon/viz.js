@@ -33,7 +33,44 @@ function buildHoverText(node) {
     return parts.join('<br>');
 }
 
+function renderNodeColumns(frame) {
+    const columns = frame.node_columns;
+    const ids = columns.id || [];
+    if (ids.length === 0) return null;
+    
+    const types = frame.neuron_types || [];
+    const nodeAt = i => ({
+        id: ids[i],
+        state: columns.state ? columns.state[i] : undefined,
+        neuron_type: columns.neuron_type ? types[columns.neuron_type[i]] : undefined,
+        real_id: columns.real_id ? columns.real_id[i] : undefined,
+        seed: columns.seed ? columns.seed[i] : undefined
+    });
+    
+    const nodeIds = ids.map(id => String(id));
+    const colors = new Array(ids.length);
+    const sizes = new Array(ids.length);
+    const hoverTexts = new Array(ids.length);
+    for (let i = 0; i < ids.length; i++) {
+        const node = nodeAt(i);
+        colors[i] = getNodeColor(node);
+        sizes[i] = getNodeSize(node);
+        hoverTexts[i] = buildHoverText(node);
+    }
+    
+    if (!cachedBaseSizes || cachedBaseSizes.length !== sizes.length) {
+        cachedBaseSizes = sizes.slice();
+        window.cachedBaseSizes = cachedBaseSizes;
+    }
+    
+    return {
+        x: columns.x, y: columns.y, z: columns.z, nodeIds, colors, sizes, hoverTexts
+    };
+}
+
 function renderNodes(frame) {
+    if (frame.node_columns) return renderNodeColumns(frame);
+    
     const nodeList = frame.display_nodes && frame.display_nodes.length > 0 
         ? frame.display_nodes 
         : Object.values(frame.nodes || {});
@@ -64,7 +101,42 @@ function renderNodes(frame) {
     };
 }
 
+function renderEdgeColumns(frame) {
+    const nodes = frame.node_columns || {};
+    const edges = frame.edge_columns || {};
+    const preIds = edges.pre_id || [];
+    if (preIds.length === 0 || !nodes.id) return [];
+    
+    const positionById = new Map();
+    nodes.id.forEach((id, i) => positionById.set(id, i));
+    
+    const order = [];
+    for (let e = 0; e < preIds.length; e++) {
+        if (positionById.has(preIds[e]) && positionById.has(edges.post_id[e])) {
+            order.push(e);
+        }
+    }
+    order.sort((a, b) => Math.abs(edges.weight[b] || 0) - Math.abs(edges.weight[a] || 0));
+    
+    const buckets = { strong: { x: [], y: [], z: [] }, medium: { x: [], y: [], z: [] }, weak: { x: [], y: [], z: [] } };
+    order.forEach(e => {
+        const weight = Math.abs(edges.weight[e] || 0);
+        const target = weight > 0.5 ? buckets.strong : (weight > 0.2 ? buckets.medium : (weight > 0.05 ? buckets.weak : null));
+        if (!target) return;
+        
+        const pre = positionById.get(preIds[e]);
+        const post = positionById.get(edges.post_id[e]);
+        target.x.push(nodes.x[pre], nodes.x[post], null);
+        target.y.push(nodes.y[pre], nodes.y[post], null);
+        target.z.push(nodes.z[pre], nodes.z[post], null);
+    });
+    
+    return buildEdgeTraces(buckets.strong, buckets.medium, buckets.weak);
+}
+
 function renderEdgesOptimized(frame) {
+    if (frame.edge_columns) return renderEdgeColumns(frame);
+    
     const connections = frame.connections || [];
     if (connections.length === 0) return [];
     
@@ -125,6 +197,10 @@ function renderEdgesOptimized(frame) {
         target.z.push(preNode.z || 0, postNode.z || 0, null);
     });
     
+    return buildEdgeTraces(strongEdges, mediumEdges, weakEdges);
+}
+
+function buildEdgeTraces(strongEdges, mediumEdges, weakEdges) {
     const traces = [];
     
     if (weakEdges.x.length > 0) {
@@ -0,0 +1,68 @@
+import threading
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from chatbot.embedding_batcher import EmbeddingBatcher, pack_batches
+
+
+def api_error(cls, status):
+    response = SimpleNamespace(request=None, status_code=status, headers={'retry-after': '0'})
+    return cls(f"HTTP {status}", response=response, body=None)
+
+
+class FakeEmbeddings:
+    """Returns [index] for text 't<index>'; rate limits the first request and rejects any batch with 'poison'."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def create(self, model, input):
+        with self.lock:
+            self.calls.append(list(input))
+            first = len(self.calls) == 1
+        if first:
+            raise api_error(openai.RateLimitError, 429)
+        if 'poison' in input:
+            raise api_error(openai.BadRequestError, 400)
+        data = [SimpleNamespace(index=i, embedding=[float(text[1:])]) for i, text in enumerate(input)]
+        # Out of order, as the API does not promise it
+        return SimpleNamespace(data=data[::-1])
+
+
+def make_batcher(embeddings, **kwargs):
+    client = SimpleNamespace(embeddings=embeddings)
+    return EmbeddingBatcher(client, 'test-model', base_delay=0, max_delay=0, **kwargs)
+
+
+def test_pack_batches_respects_token_and_item_limits():
+    assert pack_batches([5, 5, 5, 20, 1], max_tokens=10, max_items=10) == [[0, 1], [2], [3], [4]]
+    assert pack_batches([1] * 5, max_tokens=100, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_embed_retries_bisects_and_keeps_order():
+    texts = [f"t{i}" for i in range(10)]
+    texts[6] = 'poison'
+    embeddings = FakeEmbeddings()
+    batched = []
+
+    results = make_batcher(embeddings, max_items=4, max_in_flight=3).embed(
+        texts, [1] * len(texts), on_batch=lambda batch, vectors: batched.extend(batch)
+    )
+
+    assert results == [[float(i)] if i != 6 else None for i in range(10)]
+    assert sorted(batched) == list(range(10))
+    # One 429 was retried and the poisoned batch was split down to the single text
+    assert embeddings.calls.count(['poison']) == 1
+    assert len(embeddings.calls) > 3
+
+
+def test_embed_raises_after_retries_are_exhausted():
+    class AlwaysLimited:
+        def create(self, model, input):
+            raise api_error(openai.RateLimitError, 429)
+
+    with pytest.raises(openai.RateLimitError):
+        make_batcher(AlwaysLimited(), max_retries=2).embed(['t0'], [1])
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from chatbot.pipeline import RetrievalPipeline
+
+
+class FakeRetriever:
+    lexical = True
+
+    def __init__(self, embed_delay=0.0):
+        self.embed_delay = embed_delay
+
+    def try_embed_query(self, question):
+        time.sleep(self.embed_delay)
+        return [1.0, 0.0]
+
+    def retrieve(self, question, n_results=3, query_embedding=None):
+        return [{'text': 'def f(): pass', 'metadata': {'file': 'app.py', 'name': 'f'}}][:n_results]
+
+
+class FakeSanitizer:
+    def sanitize_sources(self, metadatas):
+        return [{'file': m['file']} for m in metadatas]
+
+
+class FakeWebSearch:
+    """Answers after release is set, or raises error."""
+
+    def __init__(self, error=None, wait=False):
+        self.error = error
+        self.release = threading.Event()
+        if not wait:
+            self.release.set()
+
+    def search(self, query, ip='unknown'):
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {'query': query, 'results': [{'title': 'f', 'url': 'https://example.com', 'snippet': 'f'}]}
+
+
+def make_pipeline(web_search, retriever=None, web_search_timeout=0.2):
+    return RetrievalPipeline(retriever or FakeRetriever(), FakeSanitizer(), web_search,
+                             retrieval_timeout=2, web_search_timeout=web_search_timeout)
+
+
+def run(pipeline):
+    pending = pipeline.start('what does f do')
+    return pending.finish(pending.query_embedding())
+
+
+def test_finish_includes_web_results():
+    result = run(make_pipeline(FakeWebSearch()))
+    assert result['sources'] == [{'file': 'app.py'}]
+    assert result['web']['results']
+
+
+def test_slow_web_search_is_dropped_within_its_timeout():
+    web = FakeWebSearch(wait=True)
+    try:
+        started = time.monotonic()
+        result = run(make_pipeline(web))
+        elapsed = time.monotonic() - started
+    finally:
+        web.release.set()
+    assert result['retrieved'] and result['web'] is None
+    assert elapsed < 1.0
+
+
+@pytest.mark.parametrize('error', [sqlite3.OperationalError('database is locked'), RuntimeError('boom')])
+def test_failing_web_search_is_dropped(error):
+    result = run(make_pipeline(FakeWebSearch(error=error)))
+    assert result['retrieved'] and result['web'] is None
+
+
+def test_slow_embedding_falls_back_to_lexical_search():
+    pipeline = RetrievalPipeline(FakeRetriever(embed_delay=1.0), FakeSanitizer(), retrieval_timeout=0.2)
+    assert pipeline.start('f').query_embedding() is None
+
+
+def test_cancel_does_not_block():
+    web = FakeWebSearch(wait=True)
+    try:
+        pending = make_pipeline(web, FakeRetriever(embed_delay=1.0)).start('f')
+        started = time.monotonic()
+        pending.cancel()
+        assert time.monotonic() - started < 0.1
+    finally:
+        web.release.set()
@@ -4,8 +4,13 @@ from pathlib import Path
 import json
 from collections import Counter
 from typing import Dict, List, Any
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent / 'data' / 'grid_word_cluster_analysis.json',
+    Path(__file__).parent.parent.parent / 'outputs' / 'derived' / 'grid_word_cluster_analysis.json',
+)
 def process_anna_data() -> Dict[str, Any]:
     """Process Anna word/sentence data for the explorer."""
     
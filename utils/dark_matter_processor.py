@@ -4,8 +4,12 @@ from pathlib import Path
 import json
 import re
 from typing import Dict, Any, List, Tuple
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent.parent / 'outputs' / 'reports' / '26_zeros_dark_matter_analysis_report.md',
+)
 def process_dark_matter_data() -> Dict[str, Any]:
     """Process 26 zeros (dark matter) analysis data from report."""
     
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def source_signature(path: Path) -> Optional[Tuple[str, int, int]]:
+    """(path, mtime_ns, size) of a source file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+class DataSourceRegistry:
+    """
+    Memoizes processor results keyed by the state of their source files.
+
+    A result is reused until any registered source is created, removed or
+    modified (mtime or size change). Entries are evicted least recently used
+    once max_entries is reached. Cached results are shared between requests
+    and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Any]' = OrderedDict()
+        self._sources: Dict[str, Tuple[Path, ...]] = {}
+
+    def register(self, name: str, sources: Tuple[Path, ...]):
+        self._sources[name] = tuple(Path(s) for s in sources)
+
+    def get(self, name: str, compute: Callable[[], Any]) -> Any:
+        key = (name,) + tuple(source_signature(s) for s in self._sources.get(name, ()))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        # Compute outside the lock; a concurrent miss may compute twice, which is harmless
+        result = compute()
+
+        with self._lock:
+            # Drop results computed from older versions of the same sources
+            for stale in [k for k in self._entries if k[0] == name]:
+                del self._entries[stale]
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, name: str = None):
+        """Drop the cached result for one data source, or all of them."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == name]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'sources': sorted(self._sources),
+            }
+
+
+registry = DataSourceRegistry(max_entries=int(os.getenv('DATA_CACHE_MAX_ENTRIES', '32')))
+
+
+def cached_data_source(*sources: Path, name: str = None):
+    """
+    Cache a zero-argument processor until one of its source files changes.
+
+    List every candidate path the processor may read (including fallbacks),
+    so that a file appearing or disappearing also invalidates the result.
+    """
+    def decorator(func):
+        source_name = name or func.__name__
+        registry.register(source_name, sources)
+
+        @wraps(func)
+        def wrapper():
+            return registry.get(source_name, func)
+
+        wrapper.invalidate = lambda: registry.invalidate(source_name)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate(name: str = None):
+    registry.invalidate(name)
@@ -3,8 +3,10 @@
 from pathlib import Path
 import json
 from typing import Dict, Any
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source()
 def process_discrepancy_data() -> Dict[str, Any]:
     """Process identity discrepancy analysis data."""
     
@@ -4,8 +4,12 @@ from pathlib import Path
 import json
 import re
 from typing import Dict, Any, List
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent.parent / 'outputs' / 'reports' / 'evolutionary_signatures_analysis_report.md',
+)
 def process_evolutionary_data() -> Dict[str, Any]:
     """Process evolutionary signatures analysis data from report."""
     
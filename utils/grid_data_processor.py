@@ -3,8 +3,13 @@
 from pathlib import Path
 import json
 from typing import Dict, Any
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent / 'data' / 'grid_word_cluster_analysis.json',
+    Path(__file__).parent.parent.parent / 'outputs' / 'derived' / 'grid_word_cluster_analysis.json',
+)
 def process_grid_data() -> Dict[str, Any]:
     """Process grid structure data for visualization."""
     
@@ -4,8 +4,12 @@ from pathlib import Path
 import json
 import re
 from typing import Dict, Any, List
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent.parent / 'outputs' / 'reports' / 'helix_gate_analysis_report.md',
+)
 def process_helix_data() -> Dict[str, Any]:
     """Process helix gates analysis data from report."""
     
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+"""
+On-disk cache of node layouts, keyed by a hash of the layout inputs.
+
+Every layout here is deterministic given its inputs (node list, edges,
+weights, seed), so one entry per content hash and algorithm version is
+enough. Entries are float32 .npy files; a hit refreshes the file mtime and
+the least recently used entries are evicted beyond max_entries.
+
+Prewarm with scripts/build_neuraxon_layout.py when a new export is released.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from utils.neuraxon_layout import LAYOUT_DTYPE, frame_edge_index
+
+# Bump an algorithm's version whenever its output changes for the same inputs
+LAYOUT_VERSIONS = {
+    'spherical': 1,
+    'spring': 1,
+    'force': 2,
+}
+
+CACHE_DIRNAME = 'layout_cache'
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'data' / 'neuraxon_exports' / CACHE_DIRNAME
+MAX_ENTRIES = int(os.getenv('NEURAXON_LAYOUT_CACHE_MAX_ENTRIES', '256'))
+
+
+def layout_key(algorithm: str, seed: int, *inputs) -> str:
+    """Hash of an algorithm version, seed and input arrays (dtype and shape included)."""
+    h = hashlib.sha256(f"{algorithm}:{LAYOUT_VERSIONS[algorithm]}:{seed}".encode('utf-8'))
+    for value in inputs:
+        array = np.ascontiguousarray(value)
+        h.update(f"|{array.dtype.str}{array.shape}|".encode('utf-8'))
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def frame_layout_key(columns: Dict, seed: int, algorithm: str = 'force') -> str:
+    """Key of a frame layout computed from its columns (see frame_edge_index)."""
+    edges, weights = frame_edge_index(columns)
+    return layout_key(algorithm, seed, np.array([columns['layout_size']], dtype=np.int64), edges, weights)
+
+
+class LayoutCache:
+    """Directory of cached layouts. Safe to share between threads and workers."""
+
+    def __init__(self, cache_dir: Path, max_entries: int = MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def signature(self) -> Optional[tuple]:
+        """Changes whenever an entry is added or evicted."""
+        try:
+            st = os.stat(self.cache_dir)
+        except OSError:
+            return None
+        return (st.st_mtime_ns,)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self.path(key)
+        try:
+            coords = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Read-only deployments still serve a prewarmed cache
+            pass
+        return coords
+
+    def put(self, key: str, coords: np.ndarray) -> bool:
+        """Store coords; returns False if the cache directory is not writable."""
+        path = self.path(key)
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'wb') as f:
+                np.save(f, np.asarray(coords, dtype=LAYOUT_DTYPE))
+            os.replace(tmp_file, path)
+        except OSError as e:
+            print(f"WARNING: Could not write layout cache entry {path}: {e}", file=sys.stderr)
+            return False
+
+        self._evict()
+        return True
+
+    def get_or_compute(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        coords = self.get(key)
+        if coords is None:
+            coords = np.asarray(compute(), dtype=LAYOUT_DTYPE)
+            self.put(key, coords)
+        return coords
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob('*.npy'):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_entries]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for _, path in self._entries():
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'max_entries': self.max_entries,
+            'bytes': sum(path.stat().st_size for _, path in entries if path.exists()),
+        }
+
+
+_caches: Dict[str, LayoutCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_layout_cache(cache_dir: Path = None) -> LayoutCache:
+    """
+    Shared cache for cache_dir.
+
+    NEURAXON_LAYOUT_CACHE_DIR overrides the directory, e.g. to point at a
+    writable location on serverless; defaults to data/neuraxon_exports/layout_cache.
+    """
+    cache_dir = Path(os.getenv('NEURAXON_LAYOUT_CACHE_DIR') or cache_dir or DEFAULT_CACHE_DIR)
+    key = str(cache_dir)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = LayoutCache(cache_dir)
+            _caches[key] = cache
+        return cache
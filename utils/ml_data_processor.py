@@ -3,8 +3,13 @@
 from pathlib import Path
 import json
 from typing import Dict, Any
+from utils.data_cache import cached_data_source
 
 
+@cached_data_source(
+    Path(__file__).parent.parent / 'data' / 'ml_position27_50percent_results.json',
+    Path(__file__).parent.parent.parent / 'outputs' / 'derived' / 'ml_position27_50percent_results.json',
+)
 def process_ml_data() -> Dict[str, Any]:
     """Process ML Position 27 results data."""
     
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from typing import Sequence, Tuple
+
+LAYOUT_DTYPE = np.float32
+
+
+def spherical_layout(num_nodes: int, seed: int = 42) -> np.ndarray:
+    """
+    Jittered spherical layout for one frame as an (N, 3) float32 array.
+
+    Row i is the position of the i-th node of the frame. Same formula and
+    random sequence as the original per-node loop: RandomState([seed]) is
+    seeded exactly like random.seed(seed), and each node draws its three
+    jitters (azimuth, polar, radius) in that order.
+    """
+    if num_nodes <= 0:
+        return np.zeros((0, 3), dtype=LAYOUT_DTYPE)
+
+    rng = np.random.RandomState([seed])
+    jitter = rng.random_sample((num_nodes, 3))
+
+    idx = np.arange(num_nodes, dtype=np.float64)
+    angle1 = idx * 2 * np.pi / num_nodes + (-0.1 + 0.2 * jitter[:, 0])
+    angle2 = idx * np.pi / num_nodes + (-0.1 + 0.2 * jitter[:, 1])
+    radius = 1.0 + (-0.2 + 0.4 * jitter[:, 2])
+
+    sin2 = radius * np.sin(angle2)
+    coords = np.empty((num_nodes, 3), dtype=LAYOUT_DTYPE)
+    coords[:, 0] = sin2 * np.cos(angle1)
+    coords[:, 1] = sin2 * np.sin(angle1)
+    coords[:, 2] = radius * np.cos(angle2)
+    return coords
+
+
+def spherical_layouts(sizes: Sequence[int], base_seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Layouts for many frames at once, frame i seeded with base_seed + i.
+
+    Returns (coords, offsets): coords is a (sum(sizes), 3) float32 array and
+    frame i occupies rows offsets[i]:offsets[i + 1].
+    """
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+
+    coords = np.empty((int(offsets[-1]), 3), dtype=LAYOUT_DTYPE)
+    for i, size in enumerate(sizes):
+        coords[offsets[i]:offsets[i + 1]] = spherical_layout(size, base_seed + i)
+    return coords, offsets
+
+
+def force_directed_layout(num_nodes: int, edges: np.ndarray, weights: np.ndarray = None,
+                          iterations: int = 40, seed: int = 42, gravity: float = 1.0,
+                          max_grid: int = 10) -> np.ndarray:
+    """
+    Grid-accelerated Fruchterman-Reingold layout in 3D as an (N, 3) float32 array.
+
+    Designed for 10k-100k nodes with all edges, as an offline step:
+      - attraction over every edge through a sparse incidence matrix
+      - exact repulsion only between pairs closer than the cutoff (KD-tree)
+      - far-field repulsion between coarse grid cells, applied per cell
+      - a linear pull towards the origin keeps components together
+
+    edges is an (E, 2) array of node positions (row indices), weights the
+    optional per-edge weights; attraction follows their absolute value, and
+    zero weights count as 1. The result is scaled into [-1.2, 1.2]
+    like compute_3d_layout_spring.
+    """
+    try:
+        from scipy import sparse
+        from scipy.spatial import cKDTree
+    except ImportError:
+        raise ImportError("Force-directed layout requires scipy. Install with: pip install scipy")
+
+    if num_nodes <= 0:
+        return np.zeros((0, 3), dtype=LAYOUT_DTYPE)
+    if num_nodes == 1:
+        return np.zeros((1, 3), dtype=LAYOUT_DTYPE)
+
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-0.5, 0.5, (num_nodes, 3))
+
+    # Optimal distance for nodes spread through a unit volume
+    k = (1.0 / num_nodes) ** (1.0 / 3.0)
+    cutoff = 1.5 * k
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if weights is None:
+        edge_weights = np.ones(len(edges))
+    else:
+        edge_weights = np.asarray(weights, dtype=np.float64).ravel()
+        if len(edge_weights) != len(edges):
+            raise ValueError(f"Got {len(edge_weights)} weights for {len(edges)} edges")
+        # Attraction is the weight's magnitude; unweighted (zero) edges attract like weight 1
+        edge_weights = np.abs(edge_weights)
+        edge_weights[edge_weights == 0] = 1.0
+    # Self-loops exert no force; drop them from edges and weights alike
+    keep = edges[:, 0] != edges[:, 1]
+    edges, edge_weights = edges[keep], edge_weights[keep]
+
+    # Incidence matrix: +1 at the source, -1 at the target, so B @ f adds f to
+    # the source and subtracts it from the target
+    num_edges = len(edges)
+    incidence = sparse.csr_matrix(
+        (np.concatenate([np.ones(num_edges), -np.ones(num_edges)]),
+         (np.concatenate([edges[:, 0], edges[:, 1]]), np.concatenate([np.arange(num_edges)] * 2))),
+        shape=(num_nodes, num_edges)
+    )
+
+    grid = int(max(2, min(max_grid, round((num_nodes / 64) ** (1.0 / 3.0)))))
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+
+        # Attraction: d^2 / k along each edge
+        if num_edges:
+            delta = pos[edges[:, 1]] - pos[edges[:, 0]]
+            dist = np.sqrt((delta * delta).sum(axis=1)) + 1e-9
+            disp += incidence @ ((edge_weights * dist / k)[:, None] * delta)
+
+        # Near-field repulsion: k^2 / d for pairs within the cutoff
+        pairs = cKDTree(pos, balanced_tree=False, compact_nodes=False).query_pairs(cutoff, output_type='ndarray')
+        if len(pairs):
+            i, j = pairs[:, 0], pairs[:, 1]
+            delta = pos[i] - pos[j]
+            dist2 = (delta * delta).sum(axis=1) + 1e-9
+            force = (k * k / dist2)[:, None] * delta
+            for axis in range(3):
+                disp[:, axis] += np.bincount(i, weights=force[:, axis], minlength=num_nodes)
+                disp[:, axis] -= np.bincount(j, weights=force[:, axis], minlength=num_nodes)
+
+        # Far-field repulsion from the mass of every other occupied grid cell
+        low = pos.min(axis=0)
+        span = np.maximum(pos.max(axis=0) - low, 1e-9)
+        cell_xyz = np.minimum((grid * (pos - low) / span).astype(np.int64), grid - 1)
+        cell = (cell_xyz[:, 0] * grid + cell_xyz[:, 1]) * grid + cell_xyz[:, 2]
+        occupied, node_cell = np.unique(cell, return_inverse=True)
+        mass = np.bincount(node_cell).astype(np.float64)
+        centroid = np.stack([np.bincount(node_cell, weights=pos[:, a]) for a in range(3)], axis=1) / mass[:, None]
+        if len(occupied) > 1:
+            delta = centroid[:, None, :] - centroid[None, :, :]
+            dist2 = (delta * delta).sum(axis=2)
+            np.fill_diagonal(dist2, np.inf)
+            dist2 = np.maximum(dist2, cutoff * cutoff)
+            cell_force = ((k * k * mass[None, :] / dist2)[:, :, None] * delta).sum(axis=1)
+            disp += cell_force[node_cell]
+
+        disp -= gravity * k * pos * num_nodes ** (1.0 / 3.0)
+
+        # Move at most `temperature` per iteration
+        length = np.sqrt((disp * disp).sum(axis=1)) + 1e-9
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    max_abs = np.abs(pos).max()
+    if max_abs > 0:
+        pos *= 1.2 / max_abs
+    return pos.astype(LAYOUT_DTYPE)
+
+
+def frame_edge_index(columns) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Edges of a frame as (E, 2) layout positions plus weights.
+
+    Connections whose endpoints are not annotated nodes of the frame are
+    dropped, since they are never displayed.
+    """
+    nodes = columns['nodes']
+    edges = columns['edges']
+    position_by_id = dict(zip(nodes['node_ids'], nodes['position']))
+
+    pairs = []
+    weights = []
+    for pre_id, post_id, weight in zip(edges['pre_id'], edges['post_id'], edges['weight']):
+        if pre_id in position_by_id and post_id in position_by_id:
+            pairs.append((position_by_id[pre_id], position_by_id[post_id]))
+            weights.append(weight)
+
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2), np.array(weights, dtype=np.float64)
+
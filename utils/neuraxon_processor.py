@@ -2,9 +2,13 @@
 
 from pathlib import Path
 import json
-import math
 from typing import Dict, Any, List, Optional
 
+import numpy as np
+
+from utils.neuraxon_layout import spherical_layout, force_directed_layout
+from utils.layout_cache import layout_key, get_layout_cache
+
 
 def load_neuraxon_data(network_file: Path) -> Optional[Dict[str, Any]]:
     if not network_file.exists():
@@ -17,18 +21,46 @@ def load_neuraxon_data(network_file: Path) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _connection_array(connections: List[Dict]) -> np.ndarray:
+    rows = [
+        (conn.get('pre_id'), conn.get('post_id'), conn.get('weight', 1.0))
+        for conn in connections
+        if conn.get('pre_id') is not None and conn.get('post_id') is not None
+    ]
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def _cached_layout(algorithm: str, node_ids: List[int], connections: List[Dict], seed: int, compute) -> Dict[int, tuple]:
+    """Look up a layout in the on-disk layout cache, computing and storing it on a miss."""
+    key = layout_key(algorithm, seed, np.asarray(node_ids, dtype=np.int64), _connection_array(connections))
+    coords = get_layout_cache().get_or_compute(key, compute).tolist()
+    return {node_id: tuple(xyz) for node_id, xyz in zip(node_ids, coords)}
+
+
 def compute_3d_layout_spring(node_ids: List[int], connections: List[Dict], seed: int = 42) -> Dict[int, tuple]:
-    try:
-        import networkx as nx
-    except ImportError:
-        return compute_3d_layout_simple(node_ids, seed)
-    
     if len(node_ids) == 0:
         return {}
     
     if len(node_ids) > 1000:
+        # networkx spring_layout does not scale; use the grid-accelerated engine with all edges
+        try:
+            return compute_3d_layout_force(node_ids, connections, seed)
+        except ImportError:
+            return compute_3d_layout_simple(node_ids, seed)
+    
+    try:
+        import networkx as nx
+    except ImportError:
         return compute_3d_layout_simple(node_ids, seed)
     
+    try:
+        return _cached_layout('spring', node_ids, connections, seed,
+                              lambda: _spring_coords(nx, node_ids, connections, seed))
+    except Exception:
+        return compute_3d_layout_simple(node_ids, seed)
+
+
+def _spring_coords(nx, node_ids: List[int], connections: List[Dict], seed: int) -> np.ndarray:
     g = nx.Graph()
     for node_id in node_ids:
         g.add_node(node_id)
@@ -40,115 +72,292 @@ def compute_3d_layout_spring(node_ids: List[int], connections: List[Dict], seed:
             weight = abs(conn.get('weight', 1.0))
             g.add_edge(pre_id, post_id, weight=weight)
     
-    if g.number_of_nodes() == 0:
-        return compute_3d_layout_simple(node_ids, seed)
-    
-    try:
-        layout = nx.spring_layout(g, dim=3, seed=seed, scale=1.0, k=1.8, iterations=30)
-    except Exception:
-        return compute_3d_layout_simple(node_ids, seed)
+    layout = nx.spring_layout(g, dim=3, seed=seed, scale=1.0, k=1.8, iterations=30)
     
     max_abs = max((max(abs(coord) for coord in pos) for pos in layout.values()), default=1.0)
     if max_abs == 0:
         max_abs = 1.0
     scale = 1.2 / max_abs
-    for node in layout:
-        layout[node] = tuple(c * scale for c in layout[node])
     
-    for node_id in node_ids:
-        if node_id not in layout:
-            layout[node_id] = (0.0, 0.0, 0.0)
+    return np.array([
+        [c * scale for c in layout[node_id]] if node_id in layout else [0.0, 0.0, 0.0]
+        for node_id in node_ids
+    ])
+
+
+def compute_3d_layout_force(node_ids: List[int], connections: List[Dict], seed: int = 42) -> Dict[int, tuple]:
+    position_by_id = {node_id: i for i, node_id in enumerate(node_ids)}
     
-    return layout
+    edges = []
+    weights = []
+    for conn in connections:
+        pre_id = conn.get('pre_id')
+        post_id = conn.get('post_id')
+        if pre_id in position_by_id and post_id in position_by_id:
+            edges.append((position_by_id[pre_id], position_by_id[post_id]))
+            weights.append(conn.get('weight', 1.0))
+    
+    return _cached_layout('force', node_ids, connections, seed, lambda: force_directed_layout(
+        len(node_ids), np.array(edges, dtype=np.int64).reshape(-1, 2), np.array(weights), seed=seed
+    ))
 
 
 def compute_3d_layout_simple(node_ids: List[int], seed: int = 42) -> Dict[int, tuple]:
-    import random
-    random.seed(seed)
-    
-    layout = {}
-    num_nodes = len(node_ids)
-    if num_nodes == 0:
-        return layout
-    
-    for idx, node_id in enumerate(node_ids):
-        angle1 = (idx * 2 * math.pi / max(num_nodes, 1)) + random.uniform(-0.1, 0.1)
-        angle2 = (idx * math.pi / max(num_nodes, 1)) + random.uniform(-0.1, 0.1)
-        radius = 1.0 + random.uniform(-0.2, 0.2)
-        
-        x = radius * math.sin(angle2) * math.cos(angle1)
-        y = radius * math.sin(angle2) * math.sin(angle1)
-        z = radius * math.cos(angle2)
-        
-        layout[node_id] = (x, y, z)
+    coords = spherical_layout(len(node_ids), seed).tolist()
+    return {node_id: tuple(xyz) for node_id, xyz in zip(node_ids, coords)}
+
+
+NODE_COLUMNS = ('node_ids', 'position', 'state', 'state_from_hash', 'real_id', 'seed', 'seed_hash', 'doc_id')
+EDGE_COLUMNS = ('pre_id', 'post_id', 'weight', 'w_fast', 'w_slow', 'w_meta', 'synapse_type')
+
+
+def frame_columns(frame: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a raw export frame to column lists.
+
+    Only annotated nodes are kept and their display state is resolved, so the
+    columns hold exactly what build_frame needs. 'position' is the index in the
+    frame's full node list, which the layout is computed over.
+    """
+    annotations = frame.get('annotations', {})
+    node_ids = frame.get('node_ids', [])
+    states = frame.get('states', [])
+    
+    nodes = {name: [] for name in NODE_COLUMNS}
+    for i, node_id in enumerate(node_ids):
+        if str(node_id) in annotations:
+            ann = annotations[str(node_id)]
+            nodes['node_ids'].append(node_id)
+            nodes['position'].append(i)
+            nodes['state'].append(states[i] if i < len(states) else ann.get('state_from_hash', 0))
+            nodes['state_from_hash'].append(ann.get('state_from_hash', 0))
+            nodes['real_id'].append(ann.get('real_id', ''))
+            nodes['seed'].append(ann.get('seed', ''))
+            nodes['seed_hash'].append(ann.get('seed_hash', ''))
+            nodes['doc_id'].append(ann.get('doc_id', ''))
     
-    return layout
+    edges = {name: [] for name in EDGE_COLUMNS}
+    for conn in frame.get('top_connections', []):
+        edges['pre_id'].append(conn.get('pre_id'))
+        edges['post_id'].append(conn.get('post_id'))
+        edges['weight'].append(abs(conn.get('weight', 0)))
+        edges['w_fast'].append(conn.get('w_fast', 0))
+        edges['w_slow'].append(conn.get('w_slow', 0))
+        edges['w_meta'].append(conn.get('w_meta', 0))
+        edges['synapse_type'].append(conn.get('synapse_type', ''))
+    
+    return {'layout_size': len(node_ids), 'nodes': nodes, 'edges': edges}
 
 
-def extract_frames(data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    metadata = data.get('metadata', {})
-    frames = metadata.get('frames', [])
+def build_frame(idx: int, info: Dict[str, Any], columns: Dict[str, Any], layout: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Build the API frame (layout, node objects, connections) from frame columns.
+
+    layout is an optional precomputed (layout_size, 3) array, e.g. from the
+    layout cache; defaults to the spherical layout.
+    """
+    nodes = columns['nodes']
+    edges = columns['edges']
+    node_ids = nodes['node_ids']
     
-    sanitized_frames = []
-    for idx, frame in enumerate(frames):
-        annotations = frame.get('annotations', {})
-        node_ids = frame.get('node_ids', [])
-        states = frame.get('states', [])
-        top_connections = frame.get('top_connections', [])
-        
-        layout = compute_3d_layout_simple(node_ids, seed=42 + idx)
-        
-        nodes_map = {}
-        display_nodes = []
+    # Layout over the full node list (by position) so coordinates do not depend on annotations
+    if layout is None:
+        layout = spherical_layout(columns['layout_size'], seed=42 + idx)
+    coords = layout[nodes['position']].tolist() if node_ids else []
+    
+    nodes_map = {}
+    display_nodes = []
+    
+    for i, node_id in enumerate(node_ids):
+        x, y, z = coords[i]
         
-        for i, node_id in enumerate(node_ids):
-            if str(node_id) in annotations:
-                ann = annotations[str(node_id)]
-                x, y, z = layout.get(node_id, (0.0, 0.0, 0.0))
-                state = states[i] if i < len(states) else ann.get('state_from_hash', 0)
-                
-                node_data = {
-                    'neuron_id': node_id,
-                    'id': node_id,
-                    'real_id': ann.get('real_id', ''),
-                    'seed': ann.get('seed', ''),
-                    'seed_hash': ann.get('seed_hash', ''),
-                    'doc_id': ann.get('doc_id', ''),
-                    'state': state,
-                    'state_from_hash': ann.get('state_from_hash', 0),
-                    'x': x,
-                    'y': y,
-                    'z': z,
-                    'neuron_type': 'input' if node_id < 512 else ('hidden' if node_id < 896 else 'output'),
-                }
-                nodes_map[str(node_id)] = node_data
-                display_nodes.append(node_data)
+        node_data = {
+            'neuron_id': node_id,
+            'id': node_id,
+            'real_id': nodes['real_id'][i],
+            'seed': nodes['seed'][i],
+            'seed_hash': nodes['seed_hash'][i],
+            'doc_id': nodes['doc_id'][i],
+            'state': nodes['state'][i],
+            'state_from_hash': nodes['state_from_hash'][i],
+            'x': x,
+            'y': y,
+            'z': z,
+            'neuron_type': 'input' if node_id < 512 else ('hidden' if node_id < 896 else 'output'),
+        }
+        nodes_map[str(node_id)] = node_data
+        display_nodes.append(node_data)
+    
+    sanitized_connections = [
+        dict(zip(EDGE_COLUMNS, values))
+        for values in zip(*(edges[name] for name in EDGE_COLUMNS))
+    ]
+    
+    return {
+        'index': idx,
+        'frame_id': info.get('frame_id', f'chunk_{idx}'),
+        'start_index': info.get('start_index', 0),
+        'end_index': info.get('end_index', 0),
+        'nodes': nodes_map,
+        'display_nodes': display_nodes,
+        'connections': sanitized_connections,
+    }
+
+
+FRAME_FIELDS = ('index', 'frame_id', 'start_index', 'end_index', 'nodes', 'display_nodes', 'connections')
+NODE_FIELDS = ('neuron_id', 'id', 'real_id', 'seed', 'seed_hash', 'doc_id', 'state', 'state_from_hash',
+               'x', 'y', 'z', 'neuron_type')
+
+
+def select_frame_fields(frame: Dict[str, Any], fields: Optional[tuple] = None,
+                        node_fields: Optional[tuple] = None) -> Dict[str, Any]:
+    """
+    Project a built frame onto the requested frame and node fields.
+
+    'index' and the node 'id' are always kept so clients can address frames
+    and nodes. Returns the frame itself when nothing is filtered.
+    """
+    if not fields and not node_fields:
+        return frame
+    
+    keep = set(fields or FRAME_FIELDS) | {'index'}
+    selected = {k: v for k, v in frame.items() if k in keep}
+    
+    if node_fields:
+        keep_nodes = set(node_fields) | {'id'}
+        if 'display_nodes' in selected:
+            selected['display_nodes'] = [{k: v for k, v in n.items() if k in keep_nodes} for n in selected['display_nodes']]
+        if 'nodes' in selected:
+            selected['nodes'] = {nid: {k: v for k, v in n.items() if k in keep_nodes} for nid, n in selected['nodes'].items()}
+    
+    return selected
+
+
+NEURON_TYPES = ('input', 'hidden', 'output')
+COORD_DECIMALS = 5
+
+
+def neuron_type_codes(node_ids: np.ndarray) -> np.ndarray:
+    """Index into NEURON_TYPES per node, same thresholds as build_frame."""
+    return np.where(node_ids < 512, 0, np.where(node_ids < 896, 1, 2)).astype(np.uint8)
+
+
+class ColumnarFrame:
+    """
+    Struct-of-arrays frame: one array per node field instead of a dict per node.
+
+    Numeric node fields are NumPy arrays (coordinates in float32), string
+    fields plain lists. Serialized with to_json(), which emits column arrays
+    that the client hands to Plotly without building node objects.
+    """
+    
+    __slots__ = ('index', 'frame_id', 'start_index', 'end_index', 'nodes', 'edges')
+    
+    # Column names match NODE_FIELDS; 'neuron_id' is the same as 'id' and not repeated
+    NODE_COLUMNS = ('id', 'x', 'y', 'z', 'state', 'state_from_hash', 'real_id', 'seed', 'seed_hash',
+                    'doc_id', 'neuron_type')
+    
+    def __init__(self, index: int, frame_id: str, start_index: int, end_index: int,
+                 nodes: Dict[str, Any], edges: Dict[str, Any]):
+        self.index = index
+        self.frame_id = frame_id
+        self.start_index = start_index
+        self.end_index = end_index
+        self.nodes = nodes
+        self.edges = edges
+    
+    def __len__(self) -> int:
+        return len(self.nodes['id'])
+    
+    def to_json(self, fields: Optional[tuple] = None, node_fields: Optional[tuple] = None) -> Dict[str, Any]:
+        """
+        JSON-ready dict with the same field selection rules as select_frame_fields.
+
+        'nodes' or 'display_nodes' select the node columns, 'connections' the
+        edge columns; neuron_type is sent as codes into 'neuron_types'.
+        """
+        keep = set(fields or FRAME_FIELDS) | {'index'}
+        result = {
+            key: getattr(self, key)
+            for key in ('index', 'frame_id', 'start_index', 'end_index') if key in keep
+        }
+        result['format'] = 'columns'
         
-        sanitized_connections = []
-        for conn in top_connections:
-            sanitized_connections.append({
-                'pre_id': conn.get('pre_id'),
-                'post_id': conn.get('post_id'),
-                'weight': abs(conn.get('weight', 0)),
-                'w_fast': conn.get('w_fast', 0),
-                'w_slow': conn.get('w_slow', 0),
-                'w_meta': conn.get('w_meta', 0),
-                'synapse_type': conn.get('synapse_type', ''),
-            })
+        if keep & {'nodes', 'display_nodes'}:
+            keep_nodes = {'id' if f == 'neuron_id' else f for f in (node_fields or NODE_FIELDS)} | {'id'}
+            node_columns = {}
+            for name in self.NODE_COLUMNS:
+                if name not in keep_nodes:
+                    continue
+                column = self.nodes[name]
+                if name in ('x', 'y', 'z'):
+                    column = np.round(column.astype(np.float64), COORD_DECIMALS)
+                node_columns[name] = column.tolist() if isinstance(column, np.ndarray) else column
+            result['node_columns'] = node_columns
+            if 'neuron_type' in node_columns:
+                result['neuron_types'] = list(NEURON_TYPES)
         
-        sanitized_frame = {
-            'index': idx,
-            'frame_id': frame.get('frame_id', f'chunk_{idx}'),
-            'start_index': frame.get('start_index', 0),
-            'end_index': frame.get('end_index', 0),
-            'nodes': nodes_map,
-            'display_nodes': display_nodes,
-            'connections': sanitized_connections,
-        }
+        if 'connections' in keep:
+            result['edge_columns'] = {
+                name: column.tolist() if isinstance(column, np.ndarray) else column
+                for name, column in self.edges.items()
+            }
         
-        sanitized_frames.append(sanitized_frame)
+        return result
+
+
+def build_columnar_frame(idx: int, info: Dict[str, Any], columns: Dict[str, Any],
+                         layout: Optional[np.ndarray] = None) -> ColumnarFrame:
+    """Columnar counterpart of build_frame, from the same frame columns and layout."""
+    nodes = columns['nodes']
+    edges = columns['edges']
+    
+    if layout is None:
+        layout = spherical_layout(columns['layout_size'], seed=42 + idx)
+    node_ids = np.asarray(nodes['node_ids'], dtype=np.int64)
+    coords = layout[np.asarray(nodes['position'], dtype=np.int64)] if len(node_ids) else np.zeros((0, 3), dtype=layout.dtype)
+    
+    node_columns = {
+        'id': node_ids,
+        'x': coords[:, 0],
+        'y': coords[:, 1],
+        'z': coords[:, 2],
+        'state': np.asarray(nodes['state']),
+        'state_from_hash': np.asarray(nodes['state_from_hash']),
+        'real_id': nodes['real_id'],
+        'seed': nodes['seed'],
+        'seed_hash': nodes['seed_hash'],
+        'doc_id': nodes['doc_id'],
+        'neuron_type': neuron_type_codes(node_ids),
+    }
+    
+    edge_columns = {
+        'pre_id': np.asarray(edges['pre_id']),
+        'post_id': np.asarray(edges['post_id']),
+        'weight': np.asarray(edges['weight'], dtype=np.float64),
+        'w_fast': np.asarray(edges['w_fast'], dtype=np.float64),
+        'w_slow': np.asarray(edges['w_slow'], dtype=np.float64),
+        'w_meta': np.asarray(edges['w_meta'], dtype=np.float64),
+        'synapse_type': edges['synapse_type'],
+    }
+    
+    return ColumnarFrame(
+        idx,
+        info.get('frame_id', f'chunk_{idx}'),
+        info.get('start_index', 0),
+        info.get('end_index', 0),
+        node_columns,
+        edge_columns,
+    )
+
+
+def extract_frames(data: Dict[str, Any], columnar: bool = False) -> List[Any]:
+    """Build every frame of an export, as dicts or as ColumnarFrame objects."""
+    metadata = data.get('metadata', {})
+    frames = metadata.get('frames', [])
     
-    return sanitized_frames
+    build = build_columnar_frame if columnar else build_frame
+    return [build(idx, frame, frame_columns(frame)) for idx, frame in enumerate(frames)]
 
 
 def get_frame_statistics(frames: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+"""
+Frame-indexed store for Neuraxon network exports.
+
+Layout of a store file:
+
+    magic    b'NXFS'
+    version  uint32 little-endian
+    hlen     uint32 little-endian, length of the JSON header
+    header   JSON: frame count, per-frame info, offsets and lengths, and
+             the size, mtime and hash of the export it was built from
+    blocks   one zlib-compressed JSON block of frame columns per frame
+
+Offsets are relative to the end of the header. The file is memory-mapped, so
+reading a frame touches only that frame's block and workers share the pages.
+"""
+
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.neuraxon_processor import frame_columns, build_frame, build_columnar_frame
+from utils.layout_cache import CACHE_DIRNAME, frame_layout_key, get_layout_cache
+
+MAGIC = b'NXFS'
+VERSION = 1
+PREFIX = struct.Struct('<4sII')
+
+STORE_FILENAME = 'real_ids_network.nxfs'
+EXPORT_FILENAMES = ('real_ids_network.json.gz', 'real_ids_network.json')
+
+FRAME_INFO_KEYS = ('frame_id', 'start_index', 'end_index')
+
+
+def load_export(network_file: Path) -> Optional[Dict[str, Any]]:
+    """Load a JSON export, gzip-compressed or not."""
+    if not network_file.exists():
+        return None
+
+    opener = gzip.open if network_file.suffix == '.gz' else open
+    with opener(network_file, 'rt') as f:
+        return json.load(f)
+
+
+def export_record(network_file: Path) -> Dict[str, Any]:
+    """Size, mtime and content hash of an export, kept in the header of a store built from it."""
+    st = os.stat(network_file)
+    digest = hashlib.sha256()
+    with open(network_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def frame_info(idx: int, frame: Dict[str, Any], columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-frame metadata and stats, without node payloads."""
+    node_ids = columns['nodes']['node_ids']
+    info = {'index': idx}
+    info.update({key: frame.get(key) for key in FRAME_INFO_KEYS if key in frame})
+    info.update({
+        'layout_size': columns['layout_size'],
+        'node_count': len(node_ids),
+        'edge_count': len(columns['edges']['pre_id']),
+        'node_id_min': min(node_ids) if node_ids else None,
+        'node_id_max': max(node_ids) if node_ids else None,
+    })
+    return info
+
+
+def build_header(source: str, frame_infos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'source': source,
+        'frame_count': len(frame_infos),
+        'total_nodes': sum(f['node_count'] for f in frame_infos),
+        'total_edges': sum(f['edge_count'] for f in frame_infos),
+        'frames': frame_infos,
+    }
+
+
+def convert_export(network_file: Path, store_file: Path) -> Dict[str, Any]:
+    """
+    Convert a JSON export into a frame-indexed store.
+
+    The store is written to a temporary file and renamed into place, so
+    readers never see a partially written store. Returns the header.
+    """
+    # Taken before reading, so an export rewritten meanwhile shows as newer than the store
+    record = export_record(network_file) if network_file.exists() else None
+    data = load_export(network_file)
+    if data is None:
+        raise FileNotFoundError(f"Network export not found: {network_file}")
+
+    frames = data.get('metadata', {}).get('frames', [])
+
+    blocks = []
+    frame_infos = []
+    offset = 0
+    for idx, frame in enumerate(frames):
+        columns = frame_columns(frame)
+        block = zlib.compress(json.dumps(columns, separators=(',', ':')).encode('utf-8'), 6)
+        info = frame_info(idx, frame, columns)
+        info.update({'offset': offset, 'length': len(block)})
+        frame_infos.append(info)
+        blocks.append(block)
+        offset += len(block)
+
+    header = build_header(network_file.name, frame_infos)
+    header['export'] = record
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+    # Unique per writer, so concurrent converters never swap in each other's partial file
+    fd, tmp_name = tempfile.mkstemp(prefix=store_file.name + '.', suffix='.tmp', dir=str(store_file.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for block in blocks:
+                f.write(block)
+        os.replace(tmp_name, store_file)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+    return header
+
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def source_signature(path: Path) -> tuple:
+    """Signature of a frame source file together with its layout cache."""
+    return (_file_signature(path), get_layout_cache(path.parent / CACHE_DIRNAME).signature())
+
+
+class FrameSource(ABC):
+    """
+    Common read interface for network frames.
+
+    Subclasses provide `header` and `read_columns`. Frames use the force-directed
+    layout from the layout cache next to the source when it has been prewarmed
+    (scripts/build_neuraxon_layout.py), the spherical layout otherwise. Built
+    frames are kept in a small LRU and shared between requests, so they must
+    not be modified.
+    """
+
+    header: Dict[str, Any]
+
+    def __init__(self, path: Path, cache_size: int = 8):
+        self.path = Path(path)
+        self.signature = source_signature(self.path)
+        self.cache_size = cache_size
+        self.layout_cache = get_layout_cache(self.path.parent / CACHE_DIRNAME)
+        self._lock = threading.Lock()
+        self._frames: 'OrderedDict[tuple, Any]' = OrderedDict()
+
+    @property
+    def frame_count(self) -> int:
+        return self.header['frame_count']
+
+    def frame_info(self, index: int) -> Dict[str, Any]:
+        return self.header['frames'][index]
+
+    def frame_summaries(self) -> List[Dict[str, Any]]:
+        """Per-frame stats for every frame, without offsets or node payloads."""
+        return [
+            {k: v for k, v in info.items() if k not in ('offset', 'length')}
+            for info in self.header['frames']
+        ]
+
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            'total_frames': self.frame_count,
+            'total_nodes': self.header['total_nodes'],
+            'total_display_nodes': self.header['total_nodes'],
+            'total_edges': self.header['total_edges'],
+        }
+
+    @abstractmethod
+    def read_columns(self, index: int) -> Dict[str, Any]:
+        """Column lists of one frame, as produced by frame_columns."""
+
+    def read_frame(self, index: int, columnar: bool = False):
+        """
+        Return one frame in the /api/neuraxon-data frame format, or as a
+        ColumnarFrame when columnar is set.
+        """
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f"Frame {index} out of range (0-{self.frame_count - 1})")
+
+        key = (index, columnar)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                return frame
+
+        columns = self.read_columns(index)
+        layout = self.layout_cache.get(frame_layout_key(columns, seed=42 + index))
+        build = build_columnar_frame if columnar else build_frame
+        frame = build(index, self.frame_info(index), columns, layout)
+
+        with self._lock:
+            self._frames[key] = frame
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+        return frame
+
+    def iter_frames(self, start: int = 0, stop: int = None, columnar: bool = False):
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        for index in range(start, stop):
+            yield self.read_frame(index, columnar)
+
+
+class NeuraxonFrameStore(FrameSource):
+    """Read-only, memory-mapped view of a store file."""
+
+    def __init__(self, store_file: Path, cache_size: int = 8):
+        super().__init__(store_file, cache_size)
+        self.store_file = self.path
+
+        with open(self.store_file, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Not a Neuraxon frame store (version {VERSION}): {self.store_file}")
+
+        header_start = PREFIX.size
+        self._data_start = header_start + header_len
+        self.header = json.loads(self._mm[header_start:self._data_start].decode('utf-8'))
+
+    def read_columns(self, index: int) -> Dict[str, Any]:
+        """Decode the column block of one frame."""
+        info = self.frame_info(index)
+        start = self._data_start + info['offset']
+        block = self._mm[start:start + info['length']]
+        return json.loads(zlib.decompress(block).decode('utf-8'))
+
+    def close(self):
+        self._mm.close()
+
+
+class ExportFrameSource(FrameSource):
+    """
+    Fallback over a JSON export when no store has been built.
+
+    The whole export is parsed once and kept as columns; prefer building a
+    store for production.
+    """
+
+    def __init__(self, network_file: Path, cache_size: int = 8):
+        super().__init__(network_file, cache_size)
+        self.network_file = self.path
+
+        data = load_export(self.network_file) or {}
+        frames = data.get('metadata', {}).get('frames', [])
+        self._columns = [frame_columns(frame) for frame in frames]
+        self.header = build_header(
+            self.network_file.name,
+            [frame_info(idx, frame, columns) for idx, (frame, columns) in enumerate(zip(frames, self._columns))]
+        )
+
+    def read_columns(self, index: int) -> Dict[str, Any]:
+        return self._columns[index]
+
+
+_sources: Dict[str, FrameSource] = {}
+_sources_lock = threading.Lock()
+
+
+def _shared_source(path: Path, factory) -> Optional[FrameSource]:
+    """Open path with factory once, reopening when it or its layout cache changes."""
+    signature = source_signature(path)
+    if signature[0] is None:
+        return None
+
+    key = str(path)
+    source = _sources.get(key)
+    if source is not None and source.signature == signature:
+        return source
+
+    with _sources_lock:
+        source = _sources.get(key)
+        if source is None or source.signature != signature:
+            # The old source is left to the garbage collector; requests may still be reading it
+            source = factory(path)
+            _sources[key] = source
+        return source
+
+
+def get_frame_store(store_file: Path) -> Optional[NeuraxonFrameStore]:
+    """Return a shared store for store_file, or None if it does not exist."""
+    return _shared_source(Path(store_file), NeuraxonFrameStore)
+
+
+_store_checks: Dict[tuple, bool] = {}
+
+
+def _check_store(store: NeuraxonFrameStore, export_file: Path, signature: tuple) -> bool:
+    record = store.header.get('export')
+    mtime_ns, size = signature
+    if record is None:
+        # Built before exports were recorded
+        return mtime_ns <= store.signature[0][0]
+    if size != record['size']:
+        return False
+    # A copy may change only the mtime; the content decides then
+    return mtime_ns == record['mtime_ns'] or export_record(export_file)['sha256'] == record['sha256']
+
+
+def store_is_current(store: NeuraxonFrameStore, export_dir: Path) -> bool:
+    """
+    Whether store was built from the export now in export_dir. A store whose
+    export is not next to it counts as current. The result is kept until
+    either file changes, and a stale store is reported once.
+    """
+    export_file = export_dir / store.header['source']
+    signature = _file_signature(export_file)
+    if signature is None:
+        return True
+
+    key = (str(export_file), store.signature, signature)
+    current = _store_checks.get(key)
+    if current is None:
+        current = _check_store(store, export_file, signature)
+        if not current:
+            print(f"WARNING: {store.store_file.name} is older than {export_file.name}, serving the export; "
+                  f"rebuild with scripts/build_neuraxon_store.py", file=sys.stderr)
+        with _sources_lock:
+            _store_checks.clear()
+            _store_checks[key] = current
+    return current
+
+
+def get_frame_source(export_dir: Path) -> Optional[FrameSource]:
+    """
+    Best available frame source in export_dir: the frame store if built
+    from the export there, otherwise the JSON export (compressed first).
+    None if neither exists.
+    """
+    source = get_frame_store(export_dir / STORE_FILENAME)
+    if source is not None and store_is_current(source, export_dir):
+        return source
+
+    for filename in EXPORT_FILENAMES:
+        source = _shared_source(export_dir / filename, ExportFrameSource)
+        if source is not None:
+            return source
+    return None
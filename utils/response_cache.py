@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Encoded bodies kept at once; query-dependent endpoints create one entry per variant
+MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '64'))
+
+
+class EncodedBody:
+    """
+    JSON body encoded once, with precompressed variants and a content hash.
+
+    The payload is only kept, for the identity check, when there is no
+    version; a versioned entry holds nothing but the encoded bytes.
+    """
+
+    __slots__ = ('payload', 'version', 'identity', 'gzip', 'br', 'digest')
+
+    def __init__(self, payload: Any, version: Any = None):
+        self.payload = payload if version is None else None
+        self.version = version
+        self.identity = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.digest = hashlib.sha256(self.identity).hexdigest()[:32]
+
+        compress = len(self.identity) >= MIN_COMPRESS_SIZE
+        self.gzip = gzip.compress(self.identity, compresslevel=6, mtime=0) if compress else None
+        self.br = brotli.compress(self.identity) if compress and brotli is not None else None
+
+    def etags(self):
+        # One strong ETag per representation; all of them identify the same content
+        return {
+            'identity': self.digest,
+            'gzip': f"{self.digest}-gz",
+            'br': f"{self.digest}-br",
+        }
+
+
+_bodies: 'OrderedDict[str, EncodedBody]' = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_encoded_body(name: str, payload: Any, version: Any = None) -> EncodedBody:
+    """
+    Return the encoded body for an endpoint, re-encoding only when the payload changes.
+
+    Processor results are memoized (utils.data_cache), so an unchanged source
+    hands back the very same object and the identity check is enough. Callers
+    that build a fresh payload per request can pass a version key instead, and
+    a callable payload, which is only evaluated when the body must be encoded.
+    """
+    with _lock:
+        entry = _bodies.get(name)
+        if entry is not None:
+            _bodies.move_to_end(name)
+
+    if entry is not None and version is not None and entry.version == version:
+        return entry
+    if callable(payload):
+        payload = payload()
+    if entry is None or version is not None or entry.version is not None or entry.payload is not payload:
+        entry = EncodedBody(payload, version)
+        with _lock:
+            _bodies[name] = entry
+            while len(_bodies) > MAX_ENTRIES:
+                _bodies.popitem(last=False)
+    return entry
+
+
+def _pick_encoding(entry: EncodedBody) -> str:
+    accept = request.accept_encodings
+    if entry.br is not None and accept.quality('br') > 0:
+        return 'br'
+    if entry.gzip is not None and accept.quality('gzip') > 0:
+        return 'gzip'
+    return 'identity'
+
+
+def cached_json_response(name: str, payload: Any, cache_control: Optional[str] = 'no-cache', version: Any = None) -> Response:
+    """
+    Build a JSON response from the cached body for `name`.
+
+    Endpoints that serve the same data (e.g. alias routes) should pass the
+    same name so they share one encoded body and ETag.
+    """
+    entry = get_encoded_body(name, payload, version)
+    etags = entry.etags()
+    encoding = _pick_encoding(entry)
+
+    if any(request.if_none_match.contains(tag) for tag in etags.values()):
+        response = Response(status=304)
+    else:
+        body = {'identity': entry.identity, 'gzip': entry.gzip, 'br': entry.br}[encoding]
+        response = Response(body, mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etags[encoding])
+    response.headers['Vary'] = 'Accept-Encoding'
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def clear_response_cache(name: str = None):
+    with _lock:
+        if name is None:
+            _bodies.clear()
+        else:
+            _bodies.pop(name, None)